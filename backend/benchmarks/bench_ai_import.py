@@ -0,0 +1,85 @@
+"""
+Time the AI CSV import against a local fake OpenAI endpoint
+(benchmarks/fake_openai.py): the whole file in one request, the same
+symbol-grouped chunks one after another, then chunks in parallel with
+and without failed responses. Then with the parse cache: a cold
+upload, the same file again, and the file with another week appended.
+Every run is checked against the deterministic TradeZero parser.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ai_import
+"""
+import os
+import tempfile
+import time
+from typing import Optional
+
+PORT = 8766
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ["OPENAI_API_KEY"] = "fake"
+
+from benchmarks.fake_openai import start_fake_openai  # noqa: E402
+from benchmarks.synthetic import tradezero_csv  # noqa: E402
+from src import ai_generator  # noqa: E402
+from src.parse_broker_statement import parse_tradezero_csv  # noqa: E402
+
+TRADES = 1_000
+SYMBOLS = [f"SYM{i:02d}" for i in range(40)]
+
+
+def canonical(trades: list) -> list:
+    return sorted(
+        (
+            t["ticker"],
+            tuple((tx["type"], tx["date"], tx["amount"], tx["price"], tx["commissions"]) for tx in t["transactions"]),
+        )
+        for t in trades
+    )
+
+
+def run(label: str, server, text: str, chunk_rows: Optional[int], workers: int, fail_rate: float = 0.0, cache_dir: str = ""):
+    ai_generator.AI_CHUNK_ROWS = chunk_rows or ai_generator.AI_CHUNK_ROWS
+    ai_generator.AI_MAX_WORKERS = workers
+    ai_generator.AI_CACHE_DIR = cache_dir
+    server.fail_rate = fail_rate
+    server.reset(seed=1)
+
+    start = time.perf_counter()
+    if chunk_rows is None:
+        # How imports ran before chunking, everything in one request
+        trades = ai_generator.merge_chunk_executions([ai_generator._parse_chunk_with_ai(text)])
+    else:
+        trades = ai_generator.parse_trades_from_csv_with_ai(text)
+    elapsed = time.perf_counter() - start
+
+    ok = canonical(trades) == canonical(parse_tradezero_csv(text))
+    print(f"{label:<38}{server.requests:>9}{server.rows:>7}{elapsed:>10.2f}s  {'ok' if ok else 'MISMATCH'}")
+
+
+csv_text = tradezero_csv(TRADES, seed=7, symbols=SYMBOLS).decode()
+# Same statement with another week of trades on the end
+extended_text = tradezero_csv(TRADES + 35, seed=7, symbols=SYMBOLS).decode()
+
+
+def main():
+    server = start_fake_openai(PORT)
+    rows = csv_text.count("\n") - 1
+
+    print(f"{rows} rows, {len(SYMBOLS)} symbols")
+    print(f"{'run':<38}{'requests':>9}{'rows':>7}{'time':>11}")
+    run("whole file, one request", server, csv_text, chunk_rows=None, workers=1)
+    run("200-row chunks, sequential", server, csv_text, chunk_rows=200, workers=1)
+    run("200-row chunks, 4 workers", server, csv_text, chunk_rows=200, workers=4)
+    run("200-row chunks, 8 workers", server, csv_text, chunk_rows=200, workers=8)
+    run("200-row chunks, 4 workers, 20% bad", server, csv_text, chunk_rows=200, workers=4, fail_rate=0.2)
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_ai_cache_")
+    run("cache: cold", server, csv_text, chunk_rows=200, workers=4, cache_dir=cache_dir)
+    run("cache: same file again", server, csv_text, chunk_rows=200, workers=4, cache_dir=cache_dir)
+    run("cache: a week appended", server, extended_text, chunk_rows=200, workers=4, cache_dir=cache_dir)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
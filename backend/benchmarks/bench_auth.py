@@ -0,0 +1,94 @@
+"""
+Compare the per-request cost of authenticating a session token through
+the Clerk SDK against the local verification in src/utils.py, cold
+(signature checked every time) and warm (claims served from the cache).
+
+Uses a throwaway RSA key, so no Clerk account or network is needed.
+
+Run from the backend directory:
+    python -m benchmarks.bench_auth
+"""
+import os
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from starlette.requests import Request
+
+REQUESTS = 2_000
+
+private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+public_pem = private_key.public_key().public_bytes(
+    serialization.Encoding.PEM,
+    serialization.PublicFormat.SubjectPublicKeyInfo,
+).decode()
+os.environ["JWT_KEY"] = public_pem
+
+from src import utils  # noqa: E402  needs JWT_KEY set first
+
+
+def make_token(i: int = 0) -> str:
+    now = int(time.time())
+    claims = {
+        "sub": f"user_{i}",
+        "azp": utils.AUTHORIZED_PARTIES[0],
+        "iat": now,
+        "nbf": now - 1,
+        "exp": now + 300,
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256")
+
+
+def make_request(token: str) -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/trades",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    return Request(scope)
+
+
+def clerk_sdk(request: Request):
+    return utils.authenticate_and_get_user_details(request)
+
+
+def local_cold(request: Request):
+    utils._verified_tokens = utils.TTLCache(maxsize=utils.TOKEN_CACHE_SIZE)
+    token = utils.get_session_token(request)
+    return utils.verify_session_token(token, utils._load_jwt_key())
+
+
+def local_warm(request: Request):
+    token = utils.get_session_token(request)
+    return utils.verify_session_token(token, utils._load_jwt_key())
+
+
+def bench(fn, request: Request) -> float:
+    fn(request)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        fn(request)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main():
+    request = make_request(make_token())
+
+    assert clerk_sdk(request)["user_id"] == local_warm(request)["sub"]
+
+    print(f"{'path':<28}{'us/request':>12}")
+    baseline = None
+    for name, fn in [
+        ("clerk authenticate_request", clerk_sdk),
+        ("local verify, uncached", local_cold),
+        ("local verify, cached", local_warm),
+    ]:
+        us = bench(fn, request)
+        baseline = baseline or us
+        print(f"{name:<28}{us:>12.1f}  ({baseline / us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
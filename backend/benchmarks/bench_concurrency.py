@@ -0,0 +1,156 @@
+"""
+Latency of GET /api/trades while broker imports run on the same worker.
+
+Runs the app under uvicorn against a throwaway sqlite database and
+measures the trade list alone, then with imports running alongside it.
+Each is done twice: with the routes' database work on worker threads
+(as they run it) and with it run inline on the event loop, as it was
+before run_db. Imports run as background jobs either way, so this shows
+what's left of their impact on reads.
+
+Run from the backend directory:
+    python -m benchmarks.bench_concurrency
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The database path is relative, keep the benchmark's data out of the repo
+os.chdir(tempfile.mkdtemp(prefix="bench_concurrency_"))
+os.environ.setdefault("ALPHA_VANTAGE_API_KEY", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from fastapi import Request  # noqa: E402
+
+from benchmarks.synthetic import tradezero_csv  # noqa: E402
+
+from src.app import app  # noqa: E402
+from src.database import models  # noqa: E402
+from src.routes import trades as trade_routes  # noqa: E402
+from src.utils import get_current_user  # noqa: E402
+
+models.engine.echo = False
+
+PORT = 8799
+READER_TRADES = 500
+IMPORT_TRADES = 3_000
+PHASE_SECONDS = 8
+IMPORTERS = 2
+
+def user_from_header(request: Request):
+    return {"user_id": request.headers.get("x-user", "reader")}
+
+
+async def inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def set_mode(offloaded: bool):
+    trade_routes.run_db = models.run_db if offloaded else inline
+    trade_routes.run_bulk_db = models.run_bulk_db if offloaded else inline
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def read_trades(client: httpx.AsyncClient, stop: float):
+    latencies = []
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        response = await client.get("/api/trades")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def import_loop(client: httpx.AsyncClient, stop: float, worker: int, body: bytes):
+    imports = 0
+    while time.perf_counter() < stop:
+        user = f"importer-{worker}-{imports}"
+        response = await client.post(
+            "/api/trades/import-broker-csv",
+            params={"broker": "tradezero"},
+            files={"file": ("tz.csv", body)},
+            headers={"x-user": user},
+            timeout=120,
+        )
+        response.raise_for_status()
+        await wait_for_job(client, response.json()["job_id"], user)
+        imports += 1
+    return imports
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, user: str):
+    while True:
+        job = (await client.get(f"/api/import-jobs/{job_id}", headers={"x-user": user})).json()
+        if job["status"] == "failed":
+            raise RuntimeError(job["error"])
+        if job["status"] == "succeeded":
+            return
+        await asyncio.sleep(0.1)
+
+
+async def phase(with_imports: bool, body: bytes):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60) as client:
+        stop = time.perf_counter() + PHASE_SECONDS
+        importers = [
+            asyncio.create_task(import_loop(client, stop, i, body))
+            for i in range(IMPORTERS if with_imports else 0)
+        ]
+        latencies = await read_trades(client, stop)
+        imports = sum(await asyncio.gather(*importers))
+    return latencies, imports
+
+
+def main():
+    app.dependency_overrides[get_current_user] = user_from_header
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    reader_body = tradezero_csv(READER_TRADES, seed=1)
+    import_body = tradezero_csv(IMPORT_TRADES, seed=2)
+    async def seed():
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=120) as client:
+            response = await client.post(
+                "/api/trades/import-broker-csv",
+                params={"broker": "tradezero"},
+                files={"file": ("tz.csv", reader_body)},
+            )
+            response.raise_for_status()
+            await wait_for_job(client, response.json()["job_id"], "reader")
+
+    asyncio.run(seed())
+
+    print(f"GET /api/trades ({READER_TRADES} trades), {PHASE_SECONDS}s per phase, "
+          f"{IMPORTERS} concurrent imports of {IMPORT_TRADES} trades")
+    print(f"{'mode':<12}{'load':<14}{'requests':>9}{'imports':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for offloaded in (False, True):
+        set_mode(offloaded)
+        for with_imports in (False, True):
+            latencies, imports = asyncio.run(phase(with_imports, import_body))
+            print(
+                f"{'threads' if offloaded else 'inline':<12}"
+                f"{'with imports' if with_imports else 'alone':<14}"
+                f"{len(latencies):>9}{imports:>9}"
+                f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 99):>9.1f}{max(latencies):>9.1f}"
+            )
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Compare the dashboard stats aggregated by sqlite in src/analytics.py
+against the original pure Python implementation over every closed
+trade, for parity and speed, and time a 30 day range.
+
+Run from the backend directory:
+    python -m benchmarks.bench_dashboard_stats
+"""
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_dashboard_stats_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'stats.db')}"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from src.analytics import compute_stats, load_trade_stats  # noqa: E402
+from src.database import models  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEATS = 5
+# Closed trades are spread one a minute from here
+DAY0 = datetime(2020, 1, 2, 9, 30)
+
+
+def legacy_stats(pnls: list, bases: list) -> dict:
+    """
+    The stats block as get_dashboard computed it before src/analytics.py
+    """
+    rets = []
+    for pnl, base in zip(pnls, bases):
+        if base and abs(base) > 1e-12:
+            rets.append((pnl / float(base)) * 100.0)
+        else:
+            rets.append(0.0)
+
+    wins = [p for p in pnls if p > 0]
+    losses = [p for p in pnls if p < 0]
+    win_rets = [r for (p, r) in zip(pnls, rets) if p > 0]
+    loss_rets = [r for (p, r) in zip(pnls, rets) if p < 0]
+
+    total_pnl = sum(pnls)
+    avg_win = (sum(wins) / len(wins)) if wins else 0.0
+    avg_loss = (sum(losses) / len(losses)) if losses else 0.0
+    max_win = max(pnls) if pnls else 0.0
+    max_loss = min(pnls) if pnls else 0.0
+    win_pct = (len(wins) / len(pnls) * 100.0) if pnls else 0.0
+
+    sum_wins = sum(wins)
+    sum_losses_abs = abs(sum(losses))
+    profit_factor = (sum_wins / sum_losses_abs) if sum_losses_abs > 1e-12 else (None if sum_wins == 0 else "∞")
+
+    avg_gain_pct = sum(win_rets) / len(win_rets) if win_rets else 0.0
+    avg_loss_pct = sum(loss_rets) / len(loss_rets) if loss_rets else 0.0
+    max_gain_pct = max(rets) if rets else 0.0
+    max_loss_pct = min(rets) if rets else 0.0
+
+    return {
+        "total_pnl": round(total_pnl, 2),
+        "avg_loss": round(avg_loss, 2),
+        "avg_win": round(avg_win, 2),
+        "max_loss": round(max_loss, 2),
+        "max_win": round(max_win, 2),
+        "win_pct": round(win_pct, 2),
+        "profit_factor": profit_factor if isinstance(profit_factor, str) or profit_factor is None else round(profit_factor, 2),
+        "avg_loss_pct": round(avg_loss_pct, 2),
+        "avg_gain_pct": round(avg_gain_pct, 2),
+        "max_loss_pct": round(max_loss_pct, 2),
+        "max_gain_pct": round(max_gain_pct, 2),
+    }
+
+
+def assert_parity(expected: dict, actual: dict):
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        other = actual[key]
+        if isinstance(value, float) and isinstance(other, float):
+            # Summation order differs, allow one cent of rounding drift
+            assert math.isclose(value, other, rel_tol=1e-9, abs_tol=0.011), (key, value, other)
+        else:
+            assert value == other, (key, value, other)
+
+
+def best_of(fn, *args) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def insert_closed_trades(user_id: str, pnls: list, bases: list):
+    """
+    Closed long trades with the given PnL and buy notional, one a minute
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "ticker": "AAPL",
+            "trade_type": "Long",
+            "mistake": "None",
+            "status": "Closed",
+            "realized_pnl": pnl,
+            "buy_notional": base,
+            "sell_notional": base + pnl,
+            "earliest_transaction": DAY0 + timedelta(minutes=i),
+            "latest_transaction": DAY0 + timedelta(minutes=i),
+        }
+        for i, (pnl, base) in enumerate(zip(pnls, bases))
+    ]
+    with models.engine.begin() as conn:
+        for i in range(0, len(rows), 50_000):
+            conn.execute(insert(models.Trade), rows[i : i + 50_000])
+
+
+def python_stats(db, user_id: str) -> dict:
+    """
+    Load every closed trade and compute the stats in Python, as the
+    dashboard used to
+    """
+    rows = db.execute(
+        text("SELECT realized_pnl, buy_notional FROM trades WHERE user_id = :u AND status = 'Closed'"),
+        {"u": user_id},
+    ).all()
+    return legacy_stats([r[0] for r in rows], [r[1] for r in rows])
+
+
+def sql_stats(db, user_id: str, start: datetime = None, end: datetime = None) -> dict:
+    return compute_stats(load_trade_stats(db, user_id, start, end))
+
+
+def main():
+    rng = random.Random(42)
+    db = models.SessionLocal()
+
+    edge_cases = [
+        ([], []),
+        ([10.0, 5.0], [100.0, 50.0]),
+        ([-10.0, 0.0], [100.0, 0.0]),
+        ([0.0, 0.0], [100.0, 100.0]),
+    ]
+    for i, (pnls, bases) in enumerate(edge_cases):
+        insert_closed_trades(f"edge-{i}", pnls, bases)
+        assert_parity(legacy_stats(pnls, bases), sql_stats(db, f"edge-{i}"))
+
+    print(f"{'trades':>10} {'python (ms)':>12} {'sql (ms)':>12} {'speedup':>8} {'30 days (ms)':>13}")
+    for size in SIZES:
+        bases = [0.0 if rng.random() < 0.01 else rng.uniform(100, 50_000) for _ in range(size)]
+        pnls = [rng.gauss(0, 250) for _ in range(size)]
+
+        user_id = f"user-{size}"
+        insert_closed_trades(user_id, pnls, bases)
+        assert_parity(legacy_stats(pnls, bases), sql_stats(db, user_id))
+
+        # The last 30 days of the journal
+        end = DAY0 + timedelta(minutes=size)
+        start = end - timedelta(days=30)
+
+        python_s = best_of(python_stats, db, user_id)
+        sql_s = best_of(sql_stats, db, user_id)
+        range_s = best_of(sql_stats, db, user_id, start, end)
+        print(f"{size:>10} {python_s * 1000:>12.2f} {sql_s * 1000:>12.2f} {python_s / sql_s:>7.1f}x {range_s * 1000:>13.2f}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
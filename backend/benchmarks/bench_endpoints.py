@@ -0,0 +1,213 @@
+"""
+Endpoint benchmark suite. Fills a throwaway sqlite database with
+synthetic journals (benchmarks/synthetic.py), then times the trade
+list, dashboard, CSV export and broker import endpoints through an
+in-process client with auth stubbed out, plus parse_tradezero_csv on
+its own.
+
+Results are written to benchmarks/results/ as JSON. Pass --compare
+with an earlier results file to see the change per benchmark.
+
+Run from the backend directory:
+    python -m benchmarks.bench_endpoints
+    python -m benchmarks.bench_endpoints --sizes 1000,10000,100000,1000000 --repeats 3
+    python -m benchmarks.bench_endpoints --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# Paths given on the command line are relative to here
+LAUNCH_DIR = os.getcwd()
+
+# The app keeps its database and uploads relative to the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_endpoints_"))
+os.environ["DATABASE_URL"] = "sqlite:///bench.db"
+os.environ.setdefault("ALPHA_VANTAGE_API_KEY", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from fastapi import Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from benchmarks.synthetic import fill_journal, rebuild_daily_pnl, tradezero_csv  # noqa: E402
+from src.app import app  # noqa: E402
+from src.database import models  # noqa: E402
+from src.parse_broker_statement import parse_tradezero_csv  # noqa: E402
+from src.utils import get_current_user  # noqa: E402
+
+models.engine.echo = False
+
+DEFAULT_SIZES = "1000,10000,100000"
+DEFAULT_IMPORT_SIZES = "1000,10000"
+DEFAULT_REPEATS = 5
+# Pages walked before timing a page from deep in the list
+DEEP_PAGES = 20
+# A month near the end of the synthetic journals
+DASHBOARD_RANGE = {"from": "2024-06-01", "to": "2024-06-30"}
+
+
+def user_from_header(request: Request):
+    return {"user_id": request.headers.get("x-user", "bench")}
+
+
+def timed(fn, repeats: int) -> dict:
+    """
+    Time fn after one warm up call
+    """
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeats,
+        "p50_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def get_ok(client: TestClient, url: str, user: str, **params):
+    response = client.get(url, params=params, headers={"x-user": user})
+    response.raise_for_status()
+    return response
+
+
+def deep_cursor(client: TestClient, user: str) -> str:
+    cursor = None
+    for _ in range(DEEP_PAGES):
+        page = get_ok(client, "/api/trades", user, **({"cursor": cursor} if cursor else {})).json()
+        if not page["next_cursor"]:
+            break
+        cursor = page["next_cursor"]
+    return cursor
+
+
+def run_import(client: TestClient, body: bytes, user: str):
+    response = client.post(
+        "/api/trades/import-broker-csv",
+        params={"broker": "tradezero"},
+        files={"file": ("bench.csv", body)},
+        headers={"x-user": user},
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = get_ok(client, f"/api/import-jobs/{job_id}", user).json()
+        if job["status"] == "failed":
+            raise RuntimeError(job["error"])
+        if job["status"] == "succeeded":
+            return job
+        time.sleep(0.005)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, path: str):
+    with open(path) as f:
+        previous = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+
+    print(f"\ncompared with {os.path.basename(path)} (p50)")
+    for r in results:
+        before = previous.get((r["name"], r["size"]))
+        if not before:
+            continue
+        change = (r["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else 0.0
+        print(f"{r['name']:<22}{r['size']:>9}{before['p50_ms']:>12.2f}{r['p50_ms']:>12.2f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="trades per synthetic user, comma separated")
+    parser.add_argument("--import-sizes", default=DEFAULT_IMPORT_SIZES, help="trades per imported statement")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--out", help="results file, defaults to a new file in benchmarks/results")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    import_sizes = [int(s) for s in args.import_sizes.split(",") if s]
+    compare_path = os.path.join(LAUNCH_DIR, args.compare) if args.compare else None
+
+    start = time.perf_counter()
+    for i, size in enumerate(sizes):
+        fill_journal(models.engine, f"user-{size}", size, seed=i)
+    rebuild_daily_pnl(models.engine)
+    fill_seconds = time.perf_counter() - start
+    print(f"filled {sum(sizes)} trades for {len(sizes)} users in {fill_seconds:.1f}s")
+
+    results = []
+
+    def record(name: str, size: int, fn):
+        result = {"name": name, "size": size, **timed(fn, args.repeats)}
+        results.append(result)
+        print(f"{name:<22}{size:>9}{result['p50_ms']:>12.2f}{result['min_ms']:>12.2f}{result['max_ms']:>12.2f}")
+
+    print(f"{'benchmark':<22}{'size':>9}{'p50 ms':>12}{'min ms':>12}{'max ms':>12}")
+
+    app.dependency_overrides[get_current_user] = user_from_header
+    with TestClient(app) as client:
+        for size in sizes:
+            user = f"user-{size}"
+            cursor = deep_cursor(client, user)
+            record("trades_first_page", size, lambda: get_ok(client, "/api/trades", user))
+            record("trades_deep_page", size, lambda: get_ok(client, "/api/trades", user, cursor=cursor))
+            record("trades_by_ticker", size, lambda: get_ok(client, "/api/trades", user, ticker="NVDA"))
+            record("dashboard", size, lambda: get_ok(client, "/api/dashboard", user))
+            record("dashboard_30d", size, lambda: get_ok(client, "/api/dashboard", user, **DASHBOARD_RANGE))
+            record("export_csv", size, lambda: get_ok(client, "/api/trades/export-csv", user).content)
+
+        for size in import_sizes:
+            body = tradezero_csv(size, seed=size)
+            runs = iter(range(args.repeats + 1))
+            # A fresh user each run so every import writes all its trades
+            record("import_tradezero", size, lambda: run_import(client, body, f"import-{size}-{next(runs)}"))
+
+    for size in import_sizes:
+        csv_text = tradezero_csv(size, seed=size).decode()
+        record("parse_tradezero_csv", size, lambda: parse_tradezero_csv(csv_text))
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "import_sizes": import_sizes,
+        "repeats": args.repeats,
+        "fill_seconds": round(fill_seconds, 1),
+        "results": results,
+    }
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"endpoints-{datetime.now():%Y%m%d-%H%M%S}-{report['git_commit'] or 'nogit'}.json"
+    )
+    out = os.path.join(LAUNCH_DIR, out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {out}")
+
+    if compare_path:
+        compare(results, compare_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Cost of logging on the request path. Compares the print() of a full
+Alpha Vantage response the code used to do on every quote lookup
+(stdout sent to /dev/null, so this is the best case for print) with
+the queued logging from src/logging_config.py: a debug_sample dump
+with DEBUG off, the same dump sampled at the default rate, and a
+plain logger.info with a couple of fields.
+
+Run from the backend directory:
+    python -m benchmarks.bench_logging
+"""
+import contextlib
+import logging
+import os
+import statistics
+import time
+
+from src import logging_config
+from src.logging_config import configure_logging, debug_sample, stop_logging
+
+CALLS = 2_000
+ROUNDS = 5
+
+
+def quote_payload(days: int = 100) -> dict:
+    """
+    Shaped like a TIME_SERIES_DAILY compact response
+    """
+    series = {
+        f"2026-{1 + i // 28:02d}-{1 + i % 28:02d}": {
+            "1. open": f"{100 + i:.4f}",
+            "2. high": f"{101 + i:.4f}",
+            "3. low": f"{99 + i:.4f}",
+            "4. close": f"{100.5 + i:.4f}",
+            "5. volume": str(1_000_000 + i),
+        }
+        for i in range(days)
+    }
+    return {"Meta Data": {"2. Symbol": "MSFT"}, "Time Series (Daily)": series}
+
+
+def per_call_us(fn) -> float:
+    for _ in range(100):
+        fn()
+    rounds = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            fn()
+        rounds.append((time.perf_counter() - start) / CALLS * 1e6)
+    return statistics.median(rounds)
+
+
+def main():
+    payload = quote_payload()
+    log = logging.getLogger("bench")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        printed = per_call_us(lambda: print(payload))
+
+    # The listener writes to stderr, keep it out of the terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        logging_config.LOG_LEVEL = "INFO"
+        configure_logging()
+        debug_off = per_call_us(lambda: debug_sample(log, "Alpha Vantage response", extra={"symbol": "MSFT", "payload": payload}))
+        info = per_call_us(lambda: log.info("Import job finished", extra={"job_id": "abc", "trades": 50}))
+
+        logging.getLogger().setLevel(logging.DEBUG)
+        sampled = per_call_us(lambda: debug_sample(log, "Alpha Vantage response", extra={"symbol": "MSFT", "payload": payload}))
+        stop_logging()
+
+    print(f"print(payload)            {printed:8.2f} us")
+    print(f"debug_sample, DEBUG off   {debug_off:8.2f} us")
+    print(f"debug_sample, DEBUG on    {sampled:8.2f} us (rate {logging_config.LOG_DEBUG_SAMPLE_RATE})")
+    print(f"logger.info with fields   {info:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
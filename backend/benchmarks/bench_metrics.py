@@ -0,0 +1,96 @@
+"""
+Overhead of the request metrics in src/metrics.py. Calls a minimal
+FastAPI app straight through ASGI (no sockets, no client) with and
+without MetricsMiddleware, so the difference is the middleware alone.
+Also times a bare histogram observation and rendering /metrics.
+
+Run from the backend directory:
+    python -m benchmarks.bench_metrics
+"""
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+
+from src import metrics
+from src.metrics import MetricsMiddleware
+
+REQUESTS = 20_000
+ROUNDS = 5
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/trades/{trade_id}")
+    async def get_trade(trade_id: int):
+        return {"id": trade_id}
+
+    return app
+
+
+async def call(app, trade_id: int):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/api/trades/{trade_id}",
+        "raw_path": f"/api/trades/{trade_id}".encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def per_request_us(app) -> float:
+    for i in range(500):
+        await call(app, i)
+    rounds = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            await call(app, i)
+        rounds.append((time.perf_counter() - start) / REQUESTS * 1e6)
+    return statistics.median(rounds)
+
+
+def main():
+    plain = make_app()
+    instrumented = MetricsMiddleware(make_app())
+
+    base = asyncio.run(per_request_us(plain))
+    with_metrics = asyncio.run(per_request_us(instrumented))
+    print(f"request without metrics   {base:8.1f} us")
+    print(f"request with metrics      {with_metrics:8.1f} us")
+    print(f"overhead                  {with_metrics - base:8.1f} us ({(with_metrics / base - 1) * 100:.1f}%)")
+
+    histogram = metrics.REQUEST_DURATION
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        histogram.observe(0.003, "GET", "/bench")
+    print(f"histogram observe         {(time.perf_counter() - start) / REQUESTS * 1e6:8.2f} us")
+
+    # A scrape with a realistic number of series
+    for i in range(40):
+        histogram.observe(0.01 * i, "GET", f"/route/{i}")
+        metrics.RESPONSES.inc("GET", f"/route/{i}", "200")
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"render /metrics           {(time.perf_counter() - start) * 1e3:8.2f} ms ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Alpha Vantage client check against a local stub server. Covers a
+normal TIME_SERIES_DAILY response, the quota "Note" that comes back
+as a 200, a 429 with Retry-After, and that calls share one pooled
+keep-alive connection instead of opening a new one each time.
+
+Run from the backend directory, exits non-zero on a failure:
+    python -m benchmarks.check_alpha_vantage
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault("OPENAI_API_KEY", "check")
+
+from src import alpha_vantage  # noqa: E402
+from src.alpha_vantage import AlphaVantageClient, RateLimited  # noqa: E402
+
+SERIES = {"2026-01-02": {"1. open": "1.0", "2. high": "2.0", "3. low": "0.5", "4. close": "1.5", "5. volume": "100"}}
+
+
+class StubAlphaVantage(BaseHTTPRequestHandler):
+    """
+    The symbol picks the response: NOTE gets a quota message, LIMIT a
+    429 with Retry-After, anything else a one-day series
+    """
+    protocol_version = "HTTP/1.1"
+    requests = []
+    connections = set()
+
+    def do_GET(self):
+        symbol = parse_qs(urlparse(self.path).query)["symbol"][0]
+        StubAlphaVantage.requests.append(symbol)
+        StubAlphaVantage.connections.add(self.client_address)
+
+        status, headers, body = 200, {}, {"Time Series (Daily)": SERIES}
+        if symbol == "NOTE":
+            body = {"Note": "Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day."}
+        elif symbol == "LIMIT":
+            status, headers, body = 429, {"Retry-After": "30"}, {}
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+async def calls_made(fn) -> int:
+    before = len(StubAlphaVantage.requests)
+    try:
+        await fn()
+    except RateLimited:
+        pass
+    return len(StubAlphaVantage.requests) - before
+
+
+async def run_checks(base_url: str) -> list:
+    problems = []
+
+    def stub_client() -> AlphaVantageClient:
+        client = AlphaVantageClient(base_url=base_url, api_key="check")
+        # Enough quota that only the stub's answers hold calls back
+        client.per_minute = alpha_vantage.TokenBucket(10.0, 10)
+        client.per_day = alpha_vantage.TokenBucket(10.0, 10)
+        return client
+
+    # Calls reuse the pooled connection
+    client = stub_client()
+    try:
+        for _ in range(3):
+            series = await client.get_daily_series("AAPL")
+            if series != SERIES:
+                problems.append(f"unexpected series {series}")
+        if len(StubAlphaVantage.connections) != 1:
+            problems.append(f"3 calls used {len(StubAlphaVantage.connections)} connections, expected 1")
+    finally:
+        await client.aclose()
+
+    # A quota Note is RateLimited and stops the next call going upstream
+    client = stub_client()
+    try:
+        try:
+            await client.get_daily_series("NOTE")
+            problems.append("quota Note didn't raise RateLimited")
+        except RateLimited as e:
+            if "rate limit" not in str(e):
+                problems.append(f"quota Note raised with {e}")
+        if await calls_made(lambda: client.get_daily_series("AAPL")):
+            problems.append("call after a quota Note went upstream")
+    finally:
+        await client.aclose()
+
+    # A 429 holds calls off for Retry-After, well past the refill time
+    client = stub_client()
+    try:
+        try:
+            await client.get_daily_series("LIMIT")
+            problems.append("429 didn't raise RateLimited")
+        except RateLimited:
+            pass
+        await asyncio.sleep(0.3)
+        if await calls_made(lambda: client.get_daily_series("AAPL")):
+            problems.append("call after a 429 went upstream before Retry-After")
+    finally:
+        await client.aclose()
+
+    return problems
+
+
+def main():
+    # Don't wait on a drained bucket, a refused call is what's checked
+    alpha_vantage.MAX_QUEUE_SECONDS = 0
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAlphaVantage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        start = time.perf_counter()
+        problems = asyncio.run(run_checks(f"http://127.0.0.1:{server.server_port}/query"))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print(f"{len(StubAlphaVantage.requests)} stub requests in {elapsed * 1000:.0f} ms")
+    for problem in problems:
+        print("FAIL:", problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Migration check. Builds a database with the original schema (before
+any migration, user_version 0) and a few trades of each shape, opens
+it the way the app does so create_all and every migration run, then
+checks the stored aggregates, per-fill PnL, fingerprints and daily_pnl
+rollup against what the write paths would have stored.
+
+Pass the path of an existing journal to migrate a copy of it instead,
+e.g. the committed database.db.
+
+Run from the backend directory, exits non-zero on a mismatch:
+    python -m benchmarks.check_migrations
+    python -m benchmarks.check_migrations database.db
+"""
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from types import SimpleNamespace
+
+_tmpdir = tempfile.mkdtemp(prefix="check_migrations_")
+DB_PATH = os.path.join(_tmpdir, "migrate.db")
+
+# The tables as they were before src/database/migrations.py existed
+BASELINE_SCHEMA = """
+CREATE TABLE trades (
+    id INTEGER NOT NULL,
+    user_id VARCHAR NOT NULL,
+    ticker VARCHAR NOT NULL,
+    trade_type VARCHAR,
+    mistake VARCHAR NOT NULL,
+    notes TEXT,
+    latest_transaction DATETIME,
+    earliest_transaction DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE TABLE trade_transactions (
+    id INTEGER NOT NULL,
+    trade_id INTEGER NOT NULL,
+    type VARCHAR(4) NOT NULL,
+    date DATETIME NOT NULL,
+    amount FLOAT NOT NULL,
+    price FLOAT NOT NULL,
+    commissions FLOAT NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(trade_id) REFERENCES trades (id) ON DELETE CASCADE
+);
+CREATE TABLE challenges (
+    id INTEGER NOT NULL,
+    difficulty VARCHAR NOT NULL,
+    date_created DATETIME,
+    created_by VARCHAR NOT NULL,
+    title VARCHAR NOT NULL,
+    options VARCHAR NOT NULL,
+    correct_answer_id INTEGER NOT NULL,
+    explanation VARCHAR NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE challenge_quotas (
+    id INTEGER NOT NULL,
+    user_id VARCHAR NOT NULL,
+    quota_remaining INTEGER NOT NULL,
+    last_reset_date DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (user_id)
+);
+"""
+
+# (ticker, mistake, [(type, date, amount, price, commissions)])
+BASELINE_TRADES = [
+    ("AAPL", "", [("buy", "2024-03-01 09:31:00.000000", 100, 170.5, 1.0), ("sell", "2024-03-01 10:02:00.000000", 100, 172.25, 1.0)]),
+    ("aapl", "FOMO", [("buy", "2024-03-04 09:40:00.000000", 50, 171.0, 0.5), ("sell", "2024-03-05 11:00:00.000000", 20, 175.0, 0.5)]),
+    (" Tsla", "None", [("sell", "2024-03-06 09:35:00.000000", 30, 200.0, 1.0), ("buy", "2024-03-06 15:10:00.000000", 30, 190.0, 1.0)]),
+    ("NVDA", "Chased entry", [
+        ("buy", "2024-03-07 09:30:00.000000", 10, 850.0, 0.1),
+        ("buy", "2024-03-07 09:45:00.000000", 10, 860.0, 0.1),
+        ("sell", "2024-03-08 10:00:00.000000", 15, 840.0, 0.1),
+        ("sell", "2024-03-11 10:00:00.000000", 5, 900.0, 0.1),
+    ]),
+    ("AMD", "None", [("buy", "2024-03-12 09:30:00.000000", 25, 180.0, 0.0)]),
+]
+
+
+def build_baseline(path: str):
+    con = sqlite3.connect(path)
+    con.executescript(BASELINE_SCHEMA)
+    for trade_id, (ticker, mistake, txs) in enumerate(BASELINE_TRADES, start=1):
+        dates = [tx[1] for tx in txs]
+        trade_type = "Long" if txs[0][0] == "buy" else "Short"
+        con.execute(
+            "INSERT INTO trades VALUES (?, 'check', ?, ?, ?, '', ?, ?)",
+            (trade_id, ticker, trade_type, mistake, max(dates), min(dates)),
+        )
+        con.executemany(
+            "INSERT INTO trade_transactions (trade_id, type, date, amount, price, commissions) VALUES (?, ?, ?, ?, ?, ?)",
+            [(trade_id, *tx) for tx in txs],
+        )
+    con.commit()
+    con.close()
+
+
+if len(sys.argv) > 1:
+    shutil.copyfile(sys.argv[1], DB_PATH)
+else:
+    build_baseline(DB_PATH)
+
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("OPENAI_API_KEY", "check")
+
+from sqlalchemy import text  # noqa: E402
+
+from src.database import models  # noqa: E402
+from src.database.db import apply_trade_aggregates  # noqa: E402
+from src.database.migrations import MIGRATIONS, rebuild_daily_pnl  # noqa: E402
+from src.database.normalise import normalise_ticker, transactions_fingerprint  # noqa: E402
+
+FIELDS = ("net_shares", "buy_notional", "sell_notional", "total_commissions", "realized_pnl", "status")
+
+
+def same(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def rollup(conn) -> list:
+    rows = conn.execute(text(
+        "SELECT user_id, day, mistake, ticker, realized_pnl, trade_count, wins, losses, commissions "
+        "FROM daily_pnl ORDER BY user_id, day, mistake, ticker"
+    )).all()
+    return [(*row[:4], round(row[4], 6), *row[5:8], round(row[8], 6)) for row in rows]
+
+
+def main():
+    problems = []
+    db = models.SessionLocal()
+    try:
+        version = db.execute(text("PRAGMA user_version")).scalar()
+        if version != len(MIGRATIONS):
+            problems.append(f"user_version is {version}, expected {len(MIGRATIONS)}")
+
+        trades = db.query(models.Trade).order_by(models.Trade.id).all()
+        for trade in trades:
+            stored = sorted(trade.transactions, key=lambda tx: (tx.date, tx.id))
+            txs = [
+                {"type": tx.type, "date": tx.date, "amount": tx.amount, "price": tx.price, "commissions": tx.commissions}
+                for tx in stored
+            ]
+            expected = SimpleNamespace()
+            apply_trade_aggregates(expected, txs)
+
+            for field in FIELDS:
+                if not same(getattr(trade, field), getattr(expected, field)):
+                    problems.append(f"trade {trade.id} {field}: {getattr(trade, field)} != {getattr(expected, field)}")
+            for tx, want in zip(stored, txs):
+                if not same(tx.realized_pnl, want["realized_pnl"]):
+                    problems.append(f"transaction {tx.id} realized_pnl: {tx.realized_pnl} != {want['realized_pnl']}")
+            if trade.fingerprint != transactions_fingerprint(txs):
+                problems.append(f"trade {trade.id} fingerprint is stale")
+            if trade.ticker != normalise_ticker(trade.ticker):
+                problems.append(f"trade {trade.id} ticker {trade.ticker!r} isn't upper case")
+    finally:
+        db.close()
+
+    with models.engine.begin() as conn:
+        migrated = rollup(conn)
+        rebuild_daily_pnl(conn)
+        if rollup(conn) != migrated:
+            problems.append("daily_pnl after migrating differs from a rebuild")
+
+    print(f"migrated {len(trades)} trades to version {version}, {len(migrated)} daily_pnl rows")
+    for problem in problems:
+        print("MISMATCH:", problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Query count regression check. Runs the handlers behind each endpoint
+for a small and a large journal against a throwaway sqlite database,
+counting the SQL each one issues. Fails if an endpoint goes over its
+budget, or if its count grows with the journal beyond what batching
+explains, which is what an N+1 pattern looks like.
+
+Run from the backend directory, exits non-zero on a regression:
+    python -m benchmarks.check_query_counts
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp(prefix="check_query_counts_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'counts.db')}"
+os.environ.setdefault("OPENAI_API_KEY", "check")
+
+from src.database import models  # noqa: E402
+from src.database.db import get_max_sell_count, import_trades_batch, update_trade  # noqa: E402
+from src.database.query_stats import assert_max_queries  # noqa: E402
+from src.routes import trades as trade_routes  # noqa: E402
+from benchmarks.synthetic import fill_journal, rebuild_daily_pnl, synthetic_trades  # noqa: E402
+
+SMALL = 50
+LARGE = 2_000
+
+NO_FILTERS = {"ticker": None, "status": None, "trade_type": None, "mistake": None, "start": None, "end": None}
+
+# endpoint: (most statements at LARGE, how many more LARGE may run than SMALL).
+# The export reads in batches of 1000 trades and imports look up in
+# chunks of 500, so those grow a little, nothing else should.
+BUDGETS = {
+    "GET /trades": (2, 0),
+    "GET /trades?ticker": (2, 0),
+    "GET /trades/{id}": (2, 0),
+    "GET /dashboard": (3, 0),
+    "GET /dashboard?from&to&ticker": (3, 0),
+    "GET /trades/export-csv": (4, 2),
+    "PUT /trades/{id}": (10, 0),
+    "PATCH /trades/{id}/notes": (6, 0),
+    "DELETE /trades/{id}": (5, 0),
+    "POST /trades/import-broker-csv": (12, 8),
+}
+
+
+def workload(db, user_id: str, n_trades: int) -> dict:
+    """
+    Statement count per endpoint for one user's journal
+    """
+    counts = {}
+
+    def run(name, fn, *args):
+        db.expire_all()
+        limit = BUDGETS[name][0]
+        with assert_max_queries(limit, f"{name} ({n_trades} trades)") as stats:
+            result = fn(*args)
+            if hasattr(result, "__next__"):
+                for _chunk in result:
+                    pass
+        counts[name] = stats.count
+        return result
+
+    trade_id = db.query(models.Trade.id).filter(models.Trade.user_id == user_id).first()[0]
+
+    run("GET /trades", trade_routes._list_trades, db, user_id, 50, None, NO_FILTERS)
+    run("GET /trades?ticker", trade_routes._list_trades, db, user_id, 50, None, dict(NO_FILTERS, ticker="AAPL"))
+    run("GET /trades/{id}", trade_routes._get_trade, db, user_id, trade_id)
+    run("GET /dashboard", trade_routes._build_dashboard, db, user_id)
+    run("GET /dashboard?from&to&ticker", trade_routes._build_dashboard, db, user_id,
+        {"start": datetime(2020, 3, 1), "end": datetime(2020, 4, 1), "ticker": "AAPL"})
+
+    def export():
+        get_max_sell_count(db, user_id)
+        yield from trade_routes._stream_export_csv(user_id, [], 1)
+
+    run("GET /trades/export-csv", export)
+
+    trade = db.get(models.Trade, trade_id)
+    transactions = [
+        {"type": tx.type, "date": tx.date, "amount": tx.amount, "price": tx.price, "commissions": tx.commissions}
+        for tx in trade.transactions
+    ]
+    data = {"ticker": trade.ticker, "mistake": "FOMO", "notes": "", "transactions": transactions}
+    run("PUT /trades/{id}", update_trade, db, trade_id, user_id, data)
+    run("PATCH /trades/{id}/notes", trade_routes._update_trade_notes, db, user_id, trade_id,
+        trade_routes.TradeNotesUpdate(mistake="None"))
+    run("DELETE /trades/{id}", trade_routes._delete_trade, db, user_id, trade_id)
+
+    # A statement the size of the journal, half of it already imported
+    run("POST /trades/import-broker-csv", import_trades_batch, db, user_id, synthetic_trades(n_trades, seed=n_trades))
+    return counts
+
+
+def main():
+    db = models.SessionLocal()
+    fill_journal(models.engine, "small", SMALL, seed=1)
+    fill_journal(models.engine, "large", LARGE, seed=2)
+    for user_id, n in (("small", SMALL), ("large", LARGE)):
+        import_trades_batch(db, user_id, synthetic_trades(n // 2, seed=n))
+    rebuild_daily_pnl(models.engine)
+
+    failures = 0
+    try:
+        small = workload(db, "small", SMALL)
+        large = workload(db, "large", LARGE)
+    except AssertionError as e:
+        print("OVER BUDGET:", e)
+        return 1
+    finally:
+        db.close()
+
+    print(f"{'endpoint':<34}{SMALL:>8}{LARGE:>8}  budget")
+    for name, (limit, growth) in BUDGETS.items():
+        grew = large[name] - small[name] > growth
+        failures += grew
+        flag = "  GROWS WITH JOURNAL" if grew else ""
+        print(f"{name:<34}{small[name]:>8}{large[name]:>8}  {limit:>3} +{growth}{flag}")
+
+    print(f"{failures} endpoint(s) with query counts growing with the journal")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Query plan regression check. Runs the main read and write paths against
+a throwaway sqlite database, captures the SQL they issue and fails if
+sqlite plans a full scan of a journal table for any of it.
+
+Run from the backend directory, exits non-zero on a regression:
+    python -m benchmarks.check_query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp(prefix="check_query_plans_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'plans.db')}"
+os.environ.setdefault("OPENAI_API_KEY", "check")
+
+from sqlalchemy import event  # noqa: E402
+
+from src.database import models  # noqa: E402
+from src.database.db import (  # noqa: E402
+    find_trade_by_fingerprint,
+    get_max_sell_count,
+    import_trades_batch,
+    iter_export_rows,
+    update_trade,
+)
+from src.routes import trades as trade_routes  # noqa: E402
+from benchmarks.synthetic import synthetic_trades  # noqa: E402
+
+JOURNAL_TABLES = ("trades", "trade_transactions", "daily_pnl", "daily_bars")
+FULL_SCAN = re.compile(r"^SCAN (%s)\b" % "|".join(JOURNAL_TABLES))
+USERS = ["u1", "u2", "u3"]
+
+
+def workload(db):
+    """
+    The queries behind the trade list, trade detail, dashboard, export,
+    imports and edits, for one user among several
+    """
+    user_id = USERS[0]
+    trade_id = db.query(models.Trade.id).filter(models.Trade.user_id == user_id).first()[0]
+
+    no_filters = {"ticker": None, "status": None, "trade_type": None, "mistake": None, "start": None, "end": None}
+    page = trade_routes._list_trades(db, user_id, 50, None, no_filters)
+    trade_routes._list_trades(db, user_id, 50, page["next_cursor"], no_filters)
+    trade_routes._list_trades(db, user_id, 50, None, dict(no_filters, ticker="AAPL"))
+    trade_routes._list_trades(db, user_id, 50, None, dict(no_filters, status="Closed", start=datetime(2024, 3, 1)))
+    trade_routes._get_trade(db, user_id, trade_id)
+    trade_routes._build_dashboard(db, user_id)
+    trade_routes._build_dashboard(db, user_id, {"start": datetime(2024, 3, 1), "end": datetime(2024, 4, 1), "ticker": None})
+    trade_routes._build_dashboard(db, user_id, {"start": datetime(2024, 3, 1), "end": None, "ticker": "AAPL"})
+    get_max_sell_count(db, user_id)
+    list(iter_export_rows(db, user_id))
+
+    trade = db.get(models.Trade, trade_id)
+    find_trade_by_fingerprint(db, user_id, trade.ticker, trade.fingerprint)
+
+    # Re-importing hits the fingerprint lookup and the open trade load
+    import_trades_batch(db, user_id, synthetic_trades(50, seed=0))
+
+    transactions = [
+        {"type": tx.type, "date": tx.date, "amount": tx.amount, "price": tx.price, "commissions": tx.commissions}
+        for tx in trade.transactions
+    ]
+    data = {"ticker": trade.ticker, "mistake": "FOMO", "notes": "", "transactions": transactions}
+    update_trade(db, trade_id, user_id, data)
+    trade_routes._update_trade_notes(db, user_id, trade_id, trade_routes.TradeNotesUpdate(mistake="None"))
+    trade_routes._delete_trade(db, user_id, trade_id)
+
+
+def main():
+    db = models.SessionLocal()
+    for i, user_id in enumerate(USERS):
+        import_trades_batch(db, user_id, synthetic_trades(2_000, seed=i))
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(models.engine, "before_cursor_execute", capture)
+    try:
+        workload(db)
+    finally:
+        event.remove(models.engine, "before_cursor_execute", capture)
+
+    failures = 0
+    seen = set()
+    raw = db.connection().connection.dbapi_connection
+    for statement, parameters in statements:
+        if statement in seen:
+            continue
+        seen.add(statement)
+
+        plan = [row[3] for row in raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        scans = [step for step in plan if FULL_SCAN.match(step)]
+        if scans:
+            failures += 1
+            print("FULL SCAN:", " ".join(statement.split())[:200])
+            for step in plan:
+                print("    ", step)
+
+    db.close()
+    print(f"checked {len(seen)} distinct statements, {failures} with full table scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
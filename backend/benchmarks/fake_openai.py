@@ -0,0 +1,120 @@
+"""
+A stand-in for the OpenAI chat completions endpoint, for timing and
+exercising the AI import without a key or a bill.
+
+It "parses" TradeZero style CSVs deterministically with the broker
+parser and answers in the shape the import prompt asks for. Latency
+grows with the rows in the request, like generated output does, and a
+share of responses can be made to come back as broken JSON.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1,
+or run it on its own:
+    python -m benchmarks.fake_openai --port 8766
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.parse_broker_statement import _parse_tradezero_row, group_executions_into_trades
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, base_latency: float = 0.3, row_latency: float = 0.004, fail_rate: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.base_latency = base_latency
+        self.row_latency = row_latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    def reset(self, seed: int = 0):
+        with self._lock:
+            self.requests = 0
+            self.rows = 0
+            self._rng.seed(seed)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.fail_rate
+
+
+def fake_completion(csv_text: str):
+    """
+    (trades, row count) for a chunk of TradeZero CSV
+    """
+    rows = list(csv.DictReader(io.StringIO(csv_text, newline="")))
+    executions = sorted(
+        (dt, seq, symbol, side, qty, price, comm)
+        for seq, (dt, symbol, side, qty, price, comm) in enumerate(filter(None, map(_parse_tradezero_row, rows)))
+    )
+    trades = list(group_executions_into_trades(executions))
+    for trade in trades:
+        trade["mistake"] = "None"
+    return trades, len(rows)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        csv_text = body["messages"][-1]["content"]
+
+        trades, rows = fake_completion(csv_text)
+        with self.server._lock:
+            self.server.requests += 1
+            self.server.rows += rows
+
+        time.sleep(self.server.base_latency + rows * self.server.row_latency)
+
+        content = json.dumps({"trades": trades})
+        if self.server.should_fail():
+            content = content[: len(content) // 2]
+
+        payload = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_openai(port: int, **kwargs) -> FakeOpenAI:
+    server = FakeOpenAI(port, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--row-latency", type=float, default=0.004)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOpenAI(args.port, args.base_latency, args.row_latency, args.fail_rate)
+    print(f"fake OpenAI on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
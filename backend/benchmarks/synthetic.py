@@ -0,0 +1,190 @@
+"""
+Synthetic trading data shared by the benchmarks
+"""
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Iterator, Tuple
+
+from sqlalchemy import func, insert, select, text
+
+from src.database import models
+from src.database.db import apply_trade_aggregates
+from src.database.normalise import transactions_fingerprint
+from src.parse_broker_statement import group_executions_into_trades
+
+SYMBOLS = ["AAPL", "TSLA", "NVDA", "AMD", "SPY", "MSFT", "META"]
+
+# Wider universe for journals, the first few are traded far more often
+JOURNAL_SYMBOLS = SYMBOLS + [
+    "QQQ", "AMZN", "GOOGL", "NFLX", "COIN", "PLTR", "SOFI", "RIVN", "GME", "AMC",
+    "BABA", "SHOP", "UBER", "SNAP", "ROKU", "MARA", "RIOT", "SMCI", "ARM", "INTC",
+]
+MISTAKES = ["None"] * 6 + ["FOMO", "Chased entry", "Oversized", "Moved stop", "Revenge trade", "Early exit"]
+
+# Journals span about five years of trading days whatever their size
+JOURNAL_DAYS = 1_260
+
+TZ_HEADER = [
+    "Account", "T/D", "S/D", "Currency", "Type", "Side", "Symbol", "Qty", "Price",
+    "Exec Time", "Comm", "SEC", "TAF", "NSCC", "Nasdaq", "ECN Remove", "ECN Add",
+    "Gross Proceeds", "Net Proceeds", "Clr Broker", "Liq", "Note",
+]
+
+
+def tradezero_csv(n_trades: int, seed: int, symbols: list = SYMBOLS) -> bytes:
+    """
+    A TradeZero statement of n_trades round trips, three executions each
+    """
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(TZ_HEADER)
+
+    t0 = datetime(2024, 1, 2, 9, 30)
+    for i in range(n_trades):
+        symbol = rng.choice(symbols)
+        start = t0 + timedelta(hours=i * 5)
+        qty = rng.choice([100, 200, 300])
+        opening, closing = ("B", "S") if rng.random() < 0.7 else ("S", "B")
+        price = rng.uniform(10, 300)
+        for dt, side, q, p in [
+            (start, opening, qty / 2, price),
+            (start + timedelta(minutes=3), opening, qty / 2, price * 1.001),
+            (start + timedelta(minutes=30), closing, qty, price * rng.uniform(0.97, 1.03)),
+        ]:
+            writer.writerow([
+                "TZ1", dt.strftime("%m/%d/%Y"), "", "USD", "2", side, symbol, q, round(p, 4),
+                dt.strftime("%H:%M:%S"), "0.5", "0", "0", "0", "0", "0", "0", "0", "0", "", "", "",
+            ])
+
+    return out.getvalue().encode()
+
+
+def synthetic_trades(n_trades: int, seed: int) -> list:
+    """
+    Parsed trades, ready for import_trades_batch. The last few are left
+    open so re-imports have trades to merge into.
+    """
+    rng = random.Random(seed)
+    executions = []
+    t0 = datetime(2024, 1, 2, 9, 30)
+    for i in range(n_trades):
+        symbol = rng.choice(SYMBOLS[:5])
+        start = t0 + timedelta(hours=i * 5)
+        qty = rng.choice([100, 200])
+        price = rng.uniform(10, 300)
+        executions.append((start, 3 * i, symbol, "buy", qty, price, 0.5))
+        executions.append((start + timedelta(minutes=30), 3 * i + 1, symbol, "sell", qty / 2, price * 1.01, 0.5))
+        if i < n_trades - 5:
+            executions.append((start + timedelta(minutes=60), 3 * i + 2, symbol, "sell", qty / 2, price * 0.99, 0.5))
+    return list(group_executions_into_trades(executions))
+
+
+def journal_trades(n_trades: int, seed: int, open_trades: int = 5) -> Iterator[Tuple[dict, list]]:
+    """
+    A trader's history as (trade fields, transactions) in time order.
+    Entries and exits are scaled in over one to three fills each, about
+    a third of trades are shorts and the last open_trades stay open.
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(JOURNAL_SYMBOLS))]
+    prices = {symbol: rng.uniform(5, 500) for symbol in JOURNAL_SYMBOLS}
+
+    day0 = datetime(2020, 1, 2, 9, 30)
+    per_day = max(1, -(-n_trades // JOURNAL_DAYS))
+    day = None
+    for i in range(n_trades):
+        if i % per_day == 0:
+            # Weekdays only
+            day = day0 + timedelta(days=(i // per_day) // 5 * 7 + (i // per_day) % 5)
+            minute = 0
+        minute += rng.randint(1, max(2, 390 // per_day))
+        start = day + timedelta(minutes=minute)
+
+        symbol = rng.choices(JOURNAL_SYMBOLS, weights)[0]
+        prices[symbol] = max(1.0, prices[symbol] * rng.uniform(0.97, 1.03))
+        price = prices[symbol]
+        qty = rng.choice([10, 20, 50, 100, 200, 500, 1000])
+        opening, closing = ("buy", "sell") if rng.random() < 0.68 else ("sell", "buy")
+        edge = rng.gauss(0.001, 0.012) * (1 if opening == "buy" else -1)
+
+        txs = []
+        when = start
+        for side, total, px in [(opening, qty, price), (closing, qty, price * (1 + edge))]:
+            if side == closing and i >= n_trades - open_trades:
+                break
+            fills = rng.choice([1, 1, 2, 2, 3]) if total >= 30 else 1
+            cuts = sorted(rng.sample(range(1, total // 10), fills - 1)) if fills > 1 else []
+            sizes = [(b - a) * 10 for a, b in zip([0] + cuts, cuts + [total // 10])] if cuts else [total]
+            for size in sizes:
+                when += timedelta(seconds=rng.randint(5, 900))
+                txs.append({
+                    "type": side,
+                    "date": when,
+                    "amount": float(size),
+                    "price": round(px * rng.uniform(0.999, 1.001), 4),
+                    "commissions": round(0.005 * size, 2),
+                })
+
+        trade = {"ticker": symbol, "mistake": rng.choice(MISTAKES), "notes": ""}
+        yield trade, txs
+
+
+def fill_journal(engine, user_id: str, n_trades: int, seed: int, batch_size: int = 20_000) -> int:
+    """
+    Write a synthetic journal straight into trades / trade_transactions
+    with bulk inserts, computing the stored aggregates and fingerprints
+    the way the write paths do. Much faster than importing, so users
+    with a million trades take a minute or two. Call rebuild_daily_pnl
+    once the journals are in.
+    """
+    with engine.begin() as conn:
+        next_id = (conn.execute(select(func.max(models.Trade.id))).scalar() or 0) + 1
+
+    trades, transactions = [], []
+
+    def flush():
+        with engine.begin() as conn:
+            conn.execute(insert(models.Trade), trades)
+            conn.execute(insert(models.TradeTransaction), transactions)
+        trades.clear()
+        transactions.clear()
+
+    for fields, txs in journal_trades(n_trades, seed):
+        totals = SimpleNamespace()
+        apply_trade_aggregates(totals, txs)
+        trades.append({
+            "id": next_id,
+            "user_id": user_id,
+            "ticker": fields["ticker"],
+            "trade_type": "Long" if txs[0]["type"] == "buy" else "Short",
+            "mistake": fields["mistake"],
+            "notes": fields["notes"],
+            "earliest_transaction": txs[0]["date"],
+            "latest_transaction": txs[-1]["date"],
+            "fingerprint": transactions_fingerprint(txs),
+            **vars(totals),
+        })
+        transactions.extend({"trade_id": next_id, **tx} for tx in txs)
+        next_id += 1
+
+        if len(trades) >= batch_size:
+            flush()
+    if trades:
+        flush()
+    return n_trades
+
+
+def rebuild_daily_pnl(engine):
+    """
+    Recompute the daily_pnl rollup for every user from the trade rows,
+    the same query the rollup's migration backfills with
+    """
+    from src.database.migrations import rebuild_daily_pnl as rebuild
+
+    with engine.begin() as conn:
+        rebuild(conn)
+        conn.execute(text("ANALYZE"))
@@ -1,39 +1,52 @@
 import os
+import csv
+import hashlib
+import io
 import json
-from typing import List, Dict, Any
+import logging
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional, Tuple
 
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from .database.normalise import parse_datetime_to_utc
+from .logging_config import debug_sample
+from .metrics import upstream_timer
+from .parse_broker_statement import group_executions_into_trades
+
 load_dotenv()
+log = logging.getLogger(__name__)
 
+# OPENAI_BASE_URL is picked up by the SDK, point it at a fake server for local runs
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def parse_trades_from_csv_with_ai(csv_text: str) -> List[Dict[str, Any]]:
-    """
-    Uses OpenAI to turn a broker CSV of executions into a list of trades
-    that matches our TradeCreateRequest schema:
-      {
-        "ticker": "AAPL",
-        "mistake": "None",
-        "notes": "Optional notes",
-        "transactions": [
-          {
-            "type": "buy" or "sell",
-            "date": "YYYY-MM-DDTHH:MM:SS",
-            "amount": float,
-            "price": float,
-            "commissions": float
-          },
-          ...
-        ]
-      }
-    Returns: a list of such trade dicts.
-    """
-    system_prompt = """
+AI_MODEL = "gpt-4o-mini"
+# Bump whenever the prompt or model changes, cached parses are keyed by it
+PROMPT_VERSION = "2"
+
+# Rows per request, small enough to stay well inside the context window
+AI_CHUNK_ROWS = int(os.getenv("AI_CHUNK_ROWS", 200))
+# Cached pieces of a symbol's rows are this size on average, never below the minimum
+AI_PIECE_AVG_ROWS = int(os.getenv("AI_PIECE_AVG_ROWS", 64))
+AI_PIECE_MIN_ROWS = int(os.getenv("AI_PIECE_MIN_ROWS", 16))
+# Parsed pieces are kept here, set to an empty string to turn caching off
+AI_CACHE_DIR = os.getenv("AI_CACHE_DIR", "ai_cache")
+# Requests in flight at once for one upload
+AI_MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", 4))
+# Extra rounds for chunks whose request or response failed
+AI_CHUNK_RETRIES = int(os.getenv("AI_CHUNK_RETRIES", 2))
+
+SYMBOL_COLUMNS = ("symbol", "ticker", "underlying", "instrument", "security", "stock")
+
+system_prompt = """
 You are an expert trading journal assistant.
 
-You will be given the FULL contents of a CSV file containing one or more trade executions from a broker.
+You will be given a CSV containing trade executions from a broker. It may be one part of a larger file, the header row is always included.
 
 Your job:
 1. Interpret the CSV columns (symbol/ticker, side, quantity, price, fees/commissions, date/time, etc.).
@@ -74,32 +87,310 @@ Rules:
 - You MUST return valid JSON matching this shape and nothing else.
 """
 
+
+def sniff_csv(csv_text: str) -> Tuple[csv.Dialect, List[str], List[List[str]], Optional[int]]:
+    """
+    Work out the CSV dialect and header. Returns (dialect, header, data
+    rows, index of the symbol column or None if there isn't an obvious one)
+    """
+    sample = csv_text[:64 * 1024]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(io.StringIO(csv_text, newline=""), dialect)
+    header = next(reader, [])
+    rows = [row for row in reader if any(cell.strip() for cell in row)]
+
+    names = [name.strip().lower() for name in header]
+    symbol_idx = None
+    for wanted in SYMBOL_COLUMNS:
+        matches = [i for i, name in enumerate(names) if name == wanted or name.startswith(wanted)]
+        if matches:
+            symbol_idx = matches[0]
+            break
+
+    return dialect, header, rows, symbol_idx
+
+
+def _row_digest(row: List[str]) -> bytes:
+    return hashlib.sha256("\x1f".join(cell.strip() for cell in row).encode()).digest()
+
+
+def split_symbol_pieces(rows: List[List[str]], symbol_idx: Optional[int]) -> List[Tuple[str, List[List[str]]]]:
+    """
+    Split each symbol's rows into (symbol, rows) pieces at content-defined
+    boundaries: a piece ends after a row whose hash hits the boundary
+    mask, or at AI_CHUNK_ROWS. Boundaries only depend on the rows
+    themselves, so a statement that adds rows to an older one shares all
+    but the pieces where rows were added.
+    """
+    by_symbol: "OrderedDict[str, List[List[str]]]" = OrderedDict()
+    for row in rows:
+        symbol = row[symbol_idx].strip().upper() if symbol_idx is not None and symbol_idx < len(row) else ""
+        by_symbol.setdefault(symbol, []).append(row)
+
+    pieces = []
+    for symbol, symbol_rows in by_symbol.items():
+        piece: List[List[str]] = []
+        for row in symbol_rows:
+            piece.append(row)
+            at_boundary = int.from_bytes(_row_digest(row)[:4], "big") % AI_PIECE_AVG_ROWS == 0
+            if (at_boundary and len(piece) >= AI_PIECE_MIN_ROWS) or len(piece) >= AI_CHUNK_ROWS:
+                pieces.append((symbol, piece))
+                piece = []
+        if piece:
+            pieces.append((symbol, piece))
+
+    return pieces
+
+
+def pack_requests(pieces: List[Tuple[str, List[List[str]]]], indices: List[int]) -> List[List[int]]:
+    """
+    Group pieces into requests of at most AI_CHUNK_ROWS rows, with at most
+    one piece per symbol in a request so the response can be split back
+    into pieces by ticker
+    """
+    requests: List[List[int]] = []
+    sizes: List[int] = []
+    symbols: List[set] = []
+    for i in indices:
+        symbol, piece_rows = pieces[i]
+        for r in range(len(requests)):
+            if symbol not in symbols[r] and sizes[r] + len(piece_rows) <= AI_CHUNK_ROWS:
+                break
+        else:
+            requests.append([])
+            sizes.append(0)
+            symbols.append(set())
+            r = len(requests) - 1
+        requests[r].append(i)
+        sizes[r] += len(piece_rows)
+        symbols[r].add(symbol)
+    return requests
+
+
+def piece_cache_key(header: List[str], piece_rows: List[List[str]]) -> str:
+    """
+    Content address of a piece's parse: prompt version, model, header
+    and the normalised rows
+    """
+    h = hashlib.sha256(f"{PROMPT_VERSION}\x1e{AI_MODEL}\x1e".encode())
+    h.update(_row_digest(header))
+    for row in piece_rows:
+        h.update(_row_digest(row))
+    return h.hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(AI_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def cache_get(key: str) -> Optional[List[Tuple]]:
+    if not AI_CACHE_DIR:
+        return None
     try:
+        with open(_cache_path(key)) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return [(datetime.fromisoformat(dt), *rest) for dt, *rest in stored]
+
+
+def cache_put(key: str, executions: List[Tuple]):
+    if not AI_CACHE_DIR:
+        return
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write then rename so a reader never sees half a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump([(dt.isoformat(), *rest) for dt, *rest in executions], f)
+    os.replace(tmp_path, path)
+
+
+def _split_by_piece(executions: List[Tuple], symbols: List[str]) -> Optional[List[List[Tuple]]]:
+    """
+    A request's executions per piece, or None if a ticker doesn't match
+    one of the request's symbols
+    """
+    if len(symbols) == 1:
+        return [executions]
+
+    by_symbol = {symbol: [] for symbol in symbols}
+    for execution in executions:
+        if execution[1] not in by_symbol:
+            return None
+        by_symbol[execution[1]].append(execution)
+    return [by_symbol[symbol] for symbol in symbols]
+
+
+def _chunk_csv(dialect: csv.Dialect, header: List[str], rows: List[List[str]]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out, dialect)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def _trade_executions(trades: List[Dict[str, Any]]) -> List[Tuple]:
+    """
+    (dt, ticker, side, qty, price, commissions) for every transaction in
+    the model's trades. Raises on anything malformed so the chunk is retried.
+    """
+    executions = []
+    for trade in trades:
+        ticker = str(trade["ticker"]).strip().upper()
+        for tx in trade["transactions"]:
+            side = str(tx["type"]).strip().lower()
+            if side not in ("buy", "sell"):
+                raise ValueError(f"Unknown transaction type {tx['type']!r}")
+            executions.append((
+                parse_datetime_to_utc(tx["date"]),
+                ticker,
+                side,
+                abs(float(tx["amount"])),
+                float(tx["price"]),
+                float(tx.get("commissions") or 0.0),
+            ))
+    return executions
+
+
+def _parse_chunk_with_ai(chunk_text: str) -> List[Tuple]:
+    """
+    One model call for one chunk of the CSV, returns its executions
+    """
+    with upstream_timer("openai"):
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=AI_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": csv_text},
+                {"role": "user", "content": chunk_text},
             ],
             response_format={"type": "json_object"},
             temperature=0.0,
         )
 
-        content = response.choices[0].message.content
+    content = response.choices[0].message.content
+    debug_sample(log, "AI response", extra={"payload": content})
+    data = json.loads(content)
+
+    if "trades" not in data or not isinstance(data["trades"], list):
+        raise ValueError("AI response missing 'trades' list")
+
+    return _trade_executions(data["trades"])
+
+
+def merge_chunk_executions(chunk_results: List[List[Tuple]]) -> List[Dict[str, Any]]:
+    """
+    Regroup every chunk's executions into trades per ticker by running
+    position, so a symbol split across chunks comes out the same as if
+    the model had seen it whole
+    """
+    executions = [
+        (dt, seq, ticker, side, qty, price, commissions)
+        for seq, (dt, ticker, side, qty, price, commissions) in enumerate(
+            execution for executions in chunk_results for execution in executions
+        )
+    ]
+    executions.sort(key=lambda e: (e[0], e[1]))
+    return list(group_executions_into_trades(executions))
+
+
+def parse_trades_from_csv_with_ai(
+    csv_text: str, on_progress: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Uses OpenAI to turn a broker CSV of executions into a list of trades
+    that matches our TradeCreateRequest schema:
+      {
+        "ticker": "AAPL",
+        "mistake": "None",
+        "notes": "Optional notes",
+        "transactions": [
+          {
+            "type": "buy" or "sell",
+            "date": "YYYY-MM-DDTHH:MM:SS",
+            "amount": float,
+            "price": float,
+            "commissions": float
+          },
+          ...
+        ]
+      }
+    The CSV is split into per-symbol pieces. Pieces parsed before are
+    read from the on-disk cache, the rest are packed into requests that
+    run concurrently, failed requests are retried on their own.
+    on_progress(done, total) is called from this thread as requests finish.
+    Returns: a list of such trade dicts.
+    """
+    dialect, header, rows, symbol_idx = sniff_csv(csv_text)
+    if not rows:
+        return []
+
+    pieces = split_symbol_pieces(rows, symbol_idx)
+    keys = [piece_cache_key(header, piece_rows) for _symbol, piece_rows in pieces]
+    results: List[Optional[List[Tuple]]] = [cache_get(key) for key in keys]
+
+    requests = pack_requests(pieces, [i for i, cached in enumerate(results) if cached is None])
+    request_texts = [
+        _chunk_csv(dialect, header, [row for i in request for row in pieces[i][1]])
+        for request in requests
+    ]
+    pending = list(range(len(requests)))
+    done = 0
+    if on_progress:
+        on_progress(done, len(requests))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(AI_MAX_WORKERS, len(requests)))) as pool:
+        for attempt in range(AI_CHUNK_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(min(2 ** attempt, 10))
 
-        print("AI CSV raw content:")
-        print(content)
+            futures = {r: pool.submit(_parse_chunk_with_ai, request_texts[r]) for r in pending}
+            failed = []
+            for r, future in futures.items():
+                try:
+                    executions = future.result()
+                except Exception as e:
+                    log.warning(
+                        "AI request %d/%d failed (attempt %d): %s", r + 1, len(requests), attempt + 1, e
+                    )
+                    failed.append(r)
+                    continue
 
-        data = json.loads(content)
+                request = requests[r]
+                per_piece = _split_by_piece(executions, [pieces[i][0] for i in request])
+                if per_piece is None:
+                    # Can't tell which piece a row came from, use it but don't cache it
+                    results[request[0]] = executions
+                    for i in request[1:]:
+                        results[i] = []
+                else:
+                    for i, piece_executions in zip(request, per_piece):
+                        results[i] = piece_executions
+                        cache_put(keys[i], piece_executions)
 
-        print("AI CSV parsed JSON:")
-        print(json.dumps(data, indent=2))
+                done += 1
+                if on_progress:
+                    on_progress(done, len(requests))
 
-        if "trades" not in data or not isinstance(data["trades"], list):
-            raise ValueError("AI response missing 'trades' list")
+            pending = failed
 
-        return data["trades"]
+    if pending:
+        raise ValueError(f"AI parsing failed for {len(pending)} of {len(requests)} requests")
 
-    except Exception as e:
-        print("Error parsing trades with AI:", e)
-        raise
\ No newline at end of file
+    log.info(
+        "AI CSV parsed",
+        extra={
+            "rows": len(rows),
+            "pieces": len(pieces),
+            "cached_pieces": len(pieces) - sum(len(r) for r in requests),
+            "requests": len(requests),
+        },
+    )
+    return merge_chunk_executions(results)
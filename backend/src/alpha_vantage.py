@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from .logging_config import debug_sample
+from .metrics import upstream_timer
+
+load_dotenv()
+log = logging.getLogger(__name__)
+
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+
+# Free tier quota, raise these for a premium key
+CALLS_PER_MINUTE = float(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", 5))
+CALLS_PER_DAY = float(os.getenv("ALPHA_VANTAGE_CALLS_PER_DAY", 25))
+
+# How long a request may queue for a token before we give up on upstream
+MAX_QUEUE_SECONDS = float(os.getenv("ALPHA_VANTAGE_MAX_QUEUE_SECONDS", 5))
+
+
+class RateLimited(Exception):
+    """
+    The call would exceed the Alpha Vantage quota
+    """
+
+
+class TokenBucket:
+    """
+    Async token bucket. Waiters queue in arrival order.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        async with self._lock:
+            while not self.try_acquire():
+                wait = (1 - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    return False
+                await asyncio.sleep(wait)
+            return True
+
+    def drain(self, hold_seconds: float = 0):
+        """
+        Upstream told us we're over quota, stop spending tokens for a
+        while, and for at least hold_seconds more if it said how long
+        """
+        self._refill()
+        self.tokens = -hold_seconds * self.rate
+
+
+class AlphaVantageClient:
+    """
+    Pooled async client for Alpha Vantage, limited to the API quota
+    """
+
+    def __init__(self, base_url: str = ALPHA_VANTAGE_URL, api_key: Optional[str] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.per_minute = TokenBucket(CALLS_PER_MINUTE / 60.0, CALLS_PER_MINUTE)
+        self.per_day = TokenBucket(CALLS_PER_DAY / 86400.0, CALLS_PER_DAY)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_daily_series(self, symbol: str, outputsize: str = "compact") -> Dict[str, Any]:
+        """
+        Call TIME_SERIES_DAILY and return its "Time Series (Daily)" dict.
+        Raises RateLimited instead of spending a call we don't have.
+        """
+        api_key = self.api_key or os.getenv("ALPHA_VANTAGE_API_KEY")
+        if not api_key:
+            raise HTTPException(status_code=500, detail="ALPHA_VANTAGE_API_KEY not set")
+
+        if not await self.per_minute.acquire(MAX_QUEUE_SECONDS):
+            raise RateLimited("Alpha Vantage per-minute quota reached")
+        if not self.per_day.try_acquire():
+            raise RateLimited("Alpha Vantage daily quota reached")
+
+        params = {
+            "function": "TIME_SERIES_DAILY",
+            "symbol": symbol,
+            "outputsize": outputsize,
+            "apikey": api_key,
+        }
+
+        try:
+            with upstream_timer("alpha_vantage"):
+                response = await self._http().get(self.base_url, params=params)
+                if response.status_code == 429:
+                    self.per_minute.drain(_retry_after(response))
+                    raise RateLimited("Alpha Vantage returned 429 Too Many Requests")
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Alpha Vantage request failed: {e}")
+
+        data = response.json()
+        debug_sample(log, "Alpha Vantage response", extra={"symbol": symbol, "payload": data})
+
+        time_series = data.get("Time Series (Daily)")
+        if not time_series:
+            # Quota messages come back as a 200 with a Note/Information field
+            quota_message = data.get("Note") or data.get("Information")
+            if quota_message:
+                self.per_minute.drain()
+                raise RateLimited(quota_message)
+            raise HTTPException(
+                status_code=502,
+                detail=data.get("Error Message") or "Unexpected Alpha Vantage response.",
+            )
+
+        return time_series
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """
+    Seconds from a Retry-After header, 0 if missing or given as a date
+    """
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", 0)))
+    except ValueError:
+        return 0.0
+
+
+client = AlphaVantageClient()
@@ -0,0 +1,101 @@
+from datetime import datetime
+from itertools import accumulate
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .database import models
+
+
+def load_trade_stats(
+    db: Session,
+    user_id: str,
+    start: datetime = None,
+    end: datetime = None,
+    ticker: str = None,
+) -> Dict[str, Any]:
+    """
+    Sums, counts and extremes of the PnL and percent return of the
+    user's closed trades, aggregated by sqlite in one query. start/end
+    bound the day a trade closed (end exclusive), so a date range is
+    an index range read on (user_id, latest_transaction).
+    """
+    pnl = func.coalesce(models.Trade.realized_pnl, 0.0)
+    # Percent return on the buy notional for longs, the sell notional for shorts
+    base = case(
+        (func.lower(func.coalesce(models.Trade.trade_type, "Long")) == "short", models.Trade.sell_notional),
+        else_=models.Trade.buy_notional,
+    )
+    ret = case((func.abs(base) > 1e-12, pnl / base * 100.0), else_=0.0)
+
+    stmt = select(
+        func.count().label("trades"),
+        func.count(case((pnl > 0, 1))).label("wins"),
+        func.total(pnl).label("total_pnl"),
+        func.total(case((pnl > 0, pnl))).label("sum_wins"),
+        func.total(case((pnl < 0, pnl))).label("sum_losses"),
+        func.max(pnl).label("max_win"),
+        func.min(pnl).label("max_loss"),
+        func.avg(case((pnl > 0, pnl))).label("avg_win"),
+        func.avg(case((pnl < 0, pnl))).label("avg_loss"),
+        func.avg(case((pnl > 0, ret))).label("avg_gain_pct"),
+        func.avg(case((pnl < 0, ret))).label("avg_loss_pct"),
+        func.max(ret).label("max_gain_pct"),
+        func.min(ret).label("max_loss_pct"),
+    ).where(models.Trade.user_id == user_id, models.Trade.status == "Closed")
+
+    if ticker:
+        stmt = stmt.where(models.Trade.ticker == ticker)
+    if start:
+        stmt = stmt.where(models.Trade.latest_transaction >= start)
+    if end:
+        stmt = stmt.where(models.Trade.latest_transaction < end)
+
+    return dict(db.execute(stmt).mappings().one())
+
+
+def compute_stats(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Dashboard stats block from load_trade_stats
+    """
+    def value(key: str) -> float:
+        # Aggregates over no rows are NULL
+        return round(float(totals[key] or 0.0), 2)
+
+    trades = totals["trades"]
+    win_pct = (totals["wins"] / trades * 100.0) if trades else 0.0
+
+    sum_wins = float(totals["sum_wins"])
+    sum_losses_abs = abs(float(totals["sum_losses"]))
+    if sum_losses_abs > 1e-12:
+        profit_factor = round(sum_wins / sum_losses_abs, 2)
+    else:
+        # JSON has no infinity, the frontend shows this string as is
+        profit_factor = None if sum_wins == 0 else "∞"
+
+    return {
+        "total_pnl": value("total_pnl"),
+        "avg_loss": value("avg_loss"),
+        "avg_win": value("avg_win"),
+        "max_loss": value("max_loss"),
+        "max_win": value("max_win"),
+        "win_pct": round(win_pct, 2),
+        "profit_factor": profit_factor,
+        "avg_loss_pct": value("avg_loss_pct"),
+        "avg_gain_pct": value("avg_gain_pct"),
+        "max_loss_pct": value("max_loss_pct"),
+        "max_gain_pct": value("max_gain_pct"),
+    }
+
+
+def build_equity_curve(daily_pnl: List[Tuple]) -> List[Dict[str, Any]]:
+    """
+    Cumulative PnL points from (day, pnl) rows sorted by day
+    """
+    running = accumulate(float(pnl) for _day, pnl in daily_pnl)
+
+    return [
+        {"time": day.isoformat(), "value": round(value, 2)}
+        for (day, _pnl), value in zip(daily_pnl, running)
+    ]
@@ -1,16 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import hmac
+import os
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from .logging_config import configure_logging
 from .routes import trades, webhooks, alpha
+from .alpha_vantage import client as alpha_vantage_client
+from .import_jobs import start_import_workers, stop_import_workers
+from .metrics import MetricsMiddleware, render as render_metrics
+from .database.query_stats import QueryStatsMiddleware
 
-app = FastAPI()
+# Bearer token required to scrape /metrics, open when unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Debug only, report each request's SQL statement count and time in response headers
+SQL_DEBUG_HEADERS = os.getenv("SQL_DEBUG_HEADERS", "").lower() in {"1", "true", "yes"}
+
+
+# Before anything logs, the queue listener is flushed at exit
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_import_workers()
+    yield
+    await alpha_vantage_client.aclose()
+    stop_import_workers()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-SQL-Queries", "X-SQL-Time-ms"] if SQL_DEBUG_HEADERS else [],
 )
+if SQL_DEBUG_HEADERS:
+    app.add_middleware(QueryStatsMiddleware)
+# Added last so it's outermost and times the CORS handling too
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 app.include_router(trades.router, prefix="/api")
@@ -1,111 +1,211 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, nullsfirst
-from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import desc, nullsfirst, insert, select, func, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
+import base64
+import json
+import logging
 from fastapi import HTTPException
 from . import models
+from .lots import match_lots
+from .normalise import (
+    parse_datetime_to_utc,
+    normalise_ticker,
+    normalise_transactions_for_compare,
+    transactions_fingerprint,
+)
+
+log = logging.getLogger(__name__)
+
+def find_trade_by_fingerprint(db: Session, user_id: str, ticker: str, fingerprint: str):
+    return (
+        db.query(models.Trade)
+        .filter(
+            models.Trade.user_id == user_id,
+            models.Trade.ticker == ticker,
+            models.Trade.fingerprint == fingerprint,
+        )
+        .first()
+    )
 
-def parse_datetime_to_utc(dt_input):
+CLOSED_EPSILON = 1e-9
+# PnL left on a daily_pnl row once everything on it has been taken off again
+ROLLUP_EPSILON = 1e-6
+
+def apply_trade_aggregates(trade: models.Trade, transactions: list):
     """
-    Normalise various datetime formats to a UTC datetime for sqlite
+    Recompute the stored per-trade totals from a list of transaction
+    dicts so reads never need to load the transactions. Each dict also
+    gets its realized_pnl from lot matching, to store with it.
     """
+    net_shares = 0.0
+    buy_notional = 0.0
+    sell_notional = 0.0
+    total_commissions = 0.0
 
-    if isinstance(dt_input, datetime):
-        dt = dt_input
-    elif isinstance(dt_input, str):
-        s = dt_input.strip()
+    for tx in transactions:
+        amount = float(tx["amount"])
+        notional = amount * float(tx["price"])
+        if tx["type"] == "buy":
+            net_shares += amount
+            buy_notional += notional
+        else:
+            net_shares -= amount
+            sell_notional += notional
+        total_commissions += float(tx.get("commissions") or 0)
 
-        if s.endswith(" UTC"):
-            s = s[:-4].strip()
+    trade.net_shares = net_shares
+    trade.buy_notional = buy_notional
+    trade.sell_notional = sell_notional
+    trade.total_commissions = total_commissions
+    trade.status = "Closed" if abs(net_shares) < CLOSED_EPSILON else "Open"
 
-        if s.endswith("Z"):
-            s = s[:-1] + "+00:00"
+    realized = match_lots(transactions)
+    for tx, pnl in zip(transactions, realized):
+        tx["realized_pnl"] = pnl
 
-        if len(s) == 10 and s[4] == "-" and s[7] == "-":
-            s = s + "T00:00:00"
+    # Open trades have PnL once they've been partly closed
+    fills = [pnl for pnl in realized if pnl is not None]
+    trade.realized_pnl = sum(fills) if fills or trade.status == "Closed" else None
 
-        dt = datetime.fromisoformat(s)
-    else:
-        raise TypeError("Unsupported datetime input")
 
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    else:
-        dt = dt.astimezone(timezone.utc)
+def realized_fills(transactions: list) -> list:
+    """
+    (date, realized pnl) of the closing fills among transaction dicts
+    that have been through apply_trade_aggregates
+    """
+    return [(tx["date"], tx["realized_pnl"]) for tx in transactions if tx.get("realized_pnl") is not None]
 
-    return dt.replace(tzinfo=None)
 
-def normalise_transactions_for_compare(transactions):
+def stored_fills(db: Session, trade_id: int) -> list:
     """
-    Turn a list of transactions into a sorted 
-    representation for comparison
+    realized_fills for a trade's stored transactions
     """
-    norm = []
-
-    for tx in transactions:
-        if isinstance(tx, dict):
-            dt_in = tx["date"]
-            tx_type = tx["type"]
-            amount = float(tx["amount"])
-            price = float(tx["price"])
-            commissions = float(tx.get("commissions") or 0)
-        else:
-            dt_in = tx.date
-            tx_type = tx.type
-            amount = float(tx.amount)
-            price = float(tx.price)
-            commissions = float(tx.commissions)
-
-        dt = parse_datetime_to_utc(dt_in)
-
-        norm.append(
-            (
-                dt.isoformat(timespec="microseconds"),
-                tx_type.lower(),
-                round(amount, 8),
-                round(price, 8),
-                round(commissions, 8),
-            )
+    return (
+        db.query(models.TradeTransaction.date, models.TradeTransaction.realized_pnl)
+        .filter(
+            models.TradeTransaction.trade_id == trade_id,
+            models.TradeTransaction.realized_pnl.isnot(None),
         )
+        .all()
+    )
+
+
+def rollup_contribution(trade: models.Trade, fills: list):
+    """
+    What a trade adds to daily_pnl, as a list of (day, mistake, ticker)
+    keys and (pnl, count, wins, losses, commissions). fills are the
+    trade's (date, realized pnl) from realized_fills or stored_fills,
+    each counted on the day it closed shares. Closed trades are also
+    counted once, as a win or a loss, on the day they went flat.
+    """
+    mistake = (trade.mistake or "None").strip() or "None"
+    contribution = [((date.date(), mistake, trade.ticker), (float(pnl), 0, 0, 0, 0.0)) for date, pnl in fills]
 
-    norm.sort()
-    return tuple(norm)
+    close_dt = trade.latest_transaction or trade.earliest_transaction
+    if trade.status == "Closed" and close_dt:
+        pnl = float(trade.realized_pnl or 0.0)
+        contribution.append((
+            (close_dt.date(), mistake, trade.ticker),
+            (0.0, 1, 1 if pnl > 0 else 0, 1 if pnl < 0 else 0, float(trade.total_commissions or 0.0)),
+        ))
 
+    return contribution
+
+def apply_rollup_changes(db: Session, user_id: str, removed: list = (), added: list = ()):
+    """
+    Move daily_pnl by the difference between the removed and added
+    contributions (from rollup_contribution). Rows left with no
+    trades and no PnL are deleted.
+    """
+    deltas = {}
+    for sign, contributions in ((-1, removed), (1, added)):
+        for contribution in contributions:
+            for key, values in contribution:
+                current = deltas.setdefault(key, [0.0, 0, 0, 0, 0.0])
+                for i, v in enumerate(values):
+                    current[i] += sign * v
+
+    rows = []
+    for (day, mistake, ticker), (pnl, count, wins, losses, commissions) in deltas.items():
+        if not any((pnl, count, wins, losses, commissions)):
+            continue
+        rows.append({
+            "user_id": user_id,
+            "day": day,
+            "mistake": mistake,
+            "ticker": ticker,
+            "realized_pnl": pnl,
+            "trade_count": count,
+            "wins": wins,
+            "losses": losses,
+            "commissions": commissions,
+        })
+
+    if not rows:
+        return
+
+    # One executemany for every (day, mistake, ticker) touched
+    stmt = sqlite_insert(models.DailyPnl)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day", "mistake", "ticker"],
+        set_={
+            "realized_pnl": models.DailyPnl.realized_pnl + stmt.excluded.realized_pnl,
+            "trade_count": models.DailyPnl.trade_count + stmt.excluded.trade_count,
+            "wins": models.DailyPnl.wins + stmt.excluded.wins,
+            "losses": models.DailyPnl.losses + stmt.excluded.losses,
+            "commissions": models.DailyPnl.commissions + stmt.excluded.commissions,
+        },
+    )
+    db.execute(stmt, rows)
+
+    # Only rows something was taken off can have emptied
+    emptied_days = {key[0] for contribution in removed for key, _values in contribution}
+    for chunk in _chunked(sorted(emptied_days)):
+        (
+            db.query(models.DailyPnl)
+            .filter(
+                models.DailyPnl.user_id == user_id,
+                models.DailyPnl.day.in_(chunk),
+                models.DailyPnl.trade_count <= 0,
+                func.abs(models.DailyPnl.realized_pnl) < ROLLUP_EPSILON,
+            )
+            .delete(synchronize_session=False)
+        )
 
     
 def create_trade(db: Session, user_id: str, ticker: str, mistake: str, notes: str, transactions: list):
-    
-    new_norm = normalise_transactions_for_compare(transactions)
 
-    existing_trades = (
-        db.query(models.Trade)
-        .filter(models.Trade.user_id == user_id, models.Trade.ticker == ticker)
-        .all()
-    )
+    ticker = normalise_ticker(ticker)
+    fingerprint = transactions_fingerprint(transactions)
 
     # Check for duplicates
-    for existing in existing_trades:
-        existing_norm = normalise_transactions_for_compare(existing.transactions)
-        if existing_norm == new_norm:
-            print("Duplicate trade detected for user", user_id, "ticker", ticker, "- skipping insert")
-            # Return existing trade instead of creating a new one
-            return existing
+    existing = find_trade_by_fingerprint(db, user_id, ticker, fingerprint)
+    if existing:
+        log.info("Duplicate trade, skipping insert", extra={"user_id": user_id, "ticker": ticker})
+        # Return existing trade instead of creating a new one
+        return existing
 
     latest_transaction = None
     earliest_transaction = None
     trade_type = "Long"
-    trade = models.Trade(user_id=user_id, ticker=ticker, mistake=mistake, notes=notes)
+    trade = models.Trade(user_id=user_id, ticker=ticker, mistake=mistake, notes=notes, fingerprint=fingerprint)
     db.add(trade)
     db.flush()
 
+    transactions = [dict(tx, date=parse_datetime_to_utc(tx["date"])) for tx in transactions]
+    apply_trade_aggregates(trade, transactions)
+
     for tx in transactions:
-        date = parse_datetime_to_utc(tx["date"])
+        date = tx["date"]
         transaction = models.TradeTransaction(
             trade_id=trade.id,
             type=tx["type"],
             date=date,
             amount=tx["amount"],
             price=tx["price"],
-            commissions=tx["commissions"]
+            commissions=tx["commissions"],
+            realized_pnl=tx["realized_pnl"],
         )
         if latest_transaction is None or date > latest_transaction:
             latest_transaction = date
@@ -121,29 +221,206 @@ def create_trade(db: Session, user_id: str, ticker: str, mistake: str, notes: st
     trade.latest_transaction = latest_transaction
     trade.earliest_transaction = earliest_transaction
     trade.trade_type = trade_type
+    apply_rollup_changes(db, user_id, added=[rollup_contribution(trade, realized_fills(transactions))])
 
     db.commit()
     db.refresh(trade)
     return trade
 
 
-def get_trades_by_user(db:Session, user_id: str):
-    return db.query(models.Trade).filter(models.Trade.user_id == user_id).order_by(nullsfirst(desc(models.Trade.latest_transaction))).all()
+TRADE_PAGE_SIZE = 50
+MAX_TRADE_PAGE_SIZE = 500
+
+def encode_trade_cursor(trade: models.Trade) -> str:
+    latest = trade.latest_transaction.isoformat() if trade.latest_transaction else None
+    return base64.urlsafe_b64encode(json.dumps([latest, trade.id]).encode()).decode()
+
+def decode_trade_cursor(cursor: str):
+    """
+    (latest_transaction or None, id) of the last trade on the previous page
+    """
+    try:
+        latest, trade_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(latest) if latest else None), int(trade_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def get_trades_page(
+    db: Session,
+    user_id: str,
+    limit: int = TRADE_PAGE_SIZE,
+    cursor: str = None,
+    ticker: str = None,
+    status: str = None,
+    trade_type: str = None,
+    mistake: str = None,
+    start: datetime = None,
+    end: datetime = None,
+):
+    """
+    One page of the user's trades in listing order: trades without
+    transactions first, then latest_transaction desc, ties by id desc.
+    Keyset paginated, so every page is an index range read no matter
+    how many trades the user has. start/end bound latest_transaction,
+    end is exclusive. Returns (trades, next_cursor or None).
+    """
+    query = db.query(models.Trade).filter(models.Trade.user_id == user_id)
+    if ticker:
+        query = query.filter(models.Trade.ticker == ticker)
+    if status:
+        query = query.filter(models.Trade.status == status)
+    if trade_type:
+        query = query.filter(models.Trade.trade_type == trade_type)
+    if mistake:
+        query = query.filter(models.Trade.mistake == mistake)
+    if start:
+        query = query.filter(models.Trade.latest_transaction >= start)
+    if end:
+        query = query.filter(models.Trade.latest_transaction < end)
+
+    after_latest, after_id = decode_trade_cursor(cursor) if cursor else (None, None)
+    wanted = limit + 1
+    trades = []
+
+    # sqlite sorts NULLs low, so "desc nulls first" can't come straight off
+    # the index. Read the NULL segment and the dated segment separately.
+    if after_latest is None and not (start or end):
+        undated = query.filter(models.Trade.latest_transaction.is_(None))
+        if after_id is not None:
+            undated = undated.filter(models.Trade.id < after_id)
+        trades = undated.order_by(models.Trade.id.desc()).limit(wanted).all()
+
+    if len(trades) < wanted:
+        dated = query.filter(models.Trade.latest_transaction.isnot(None))
+        if after_latest is not None:
+            dated = dated.filter(
+                tuple_(models.Trade.latest_transaction, models.Trade.id) < tuple_(after_latest, after_id)
+            )
+        trades += (
+            dated.order_by(models.Trade.latest_transaction.desc(), models.Trade.id.desc())
+            .limit(wanted - len(trades))
+            .all()
+        )
+
+    if len(trades) > limit:
+        return trades[:limit], encode_trade_cursor(trades[limit - 1])
+    return trades, None
+
+def _rollup_filters(user_id: str, start: datetime, end: datetime, ticker: str):
+    """
+    daily_pnl conditions for one user, days from start up to but not
+    including end, and optionally a single ticker
+    """
+    conditions = [models.DailyPnl.user_id == user_id]
+    if ticker:
+        conditions.append(models.DailyPnl.ticker == ticker)
+    if start:
+        conditions.append(models.DailyPnl.day >= start.date())
+    if end:
+        conditions.append(models.DailyPnl.day < end.date())
+    return conditions
+
+def get_daily_pnl(
+    db: Session,
+    user_id: str,
+    start: datetime = None,
+    end: datetime = None,
+    ticker: str = None,
+):
+    """
+    (day, realized pnl) for every day the user closed shares, oldest first
+    """
+    return (
+        db.query(models.DailyPnl.day, func.sum(models.DailyPnl.realized_pnl))
+        .filter(*_rollup_filters(user_id, start, end, ticker))
+        .group_by(models.DailyPnl.day)
+        .order_by(models.DailyPnl.day)
+        .all()
+    )
+
+def get_mistake_breakdown(
+    db: Session,
+    user_id: str,
+    start: datetime = None,
+    end: datetime = None,
+    ticker: str = None,
+):
+    """
+    (mistake, closed trade count, realized pnl) per mistake
+    """
+    return (
+        db.query(
+            models.DailyPnl.mistake,
+            func.sum(models.DailyPnl.trade_count),
+            func.sum(models.DailyPnl.realized_pnl),
+        )
+        .filter(*_rollup_filters(user_id, start, end, ticker))
+        .group_by(models.DailyPnl.mistake)
+        .all()
+    )
+
+def get_max_sell_count(db: Session, user_id: str) -> int:
+    """
+    Largest number of sell transactions on any one of the user's trades
+    """
+    sells_per_trade = (
+        select(func.count().label("sells"))
+        .select_from(models.TradeTransaction)
+        .join(models.Trade, models.Trade.id == models.TradeTransaction.trade_id)
+        .where(models.Trade.user_id == user_id, models.TradeTransaction.type == "sell")
+        .group_by(models.TradeTransaction.trade_id)
+        .subquery()
+    )
+    return db.execute(select(func.max(sells_per_trade.c.sells))).scalar() or 0
+
+def iter_export_rows(db: Session, user_id: str, batch_size: int = 1000):
+    """
+    Stream (trade, transaction) rows for the user's trades in listing
+    order, each trade's transactions by date. Trades without
+    transactions come through once with the transaction columns as None.
+    """
+    stmt = (
+        select(
+            models.Trade.id,
+            models.Trade.ticker,
+            models.Trade.trade_type,
+            models.TradeTransaction.type,
+            models.TradeTransaction.date,
+            models.TradeTransaction.amount,
+            models.TradeTransaction.price,
+            models.TradeTransaction.commissions,
+        )
+        .outerjoin(models.TradeTransaction, models.TradeTransaction.trade_id == models.Trade.id)
+        .where(models.Trade.user_id == user_id)
+        .order_by(
+            nullsfirst(desc(models.Trade.latest_transaction)),
+            models.Trade.id,
+            models.TradeTransaction.date,
+            models.TradeTransaction.id,
+        )
+        .execution_options(yield_per=batch_size)
+    )
+    return db.execute(stmt)
 
 def update_trade(db:Session, trade_id: int, user_id: str, data: dict):
     trade = db.query(models.Trade).filter(models.Trade.id == trade_id, models.Trade.user_id == user_id).first()
 
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
-    
-    trade.ticker = data["ticker"]
+
+    previous = rollup_contribution(trade, stored_fills(db, trade_id))
+
+    trade.ticker = normalise_ticker(data["ticker"])
     trade.notes = data["notes"]
     trade.mistake = data["mistake"]
     db.query(models.TradeTransaction).filter(models.TradeTransaction.trade_id == trade_id).delete()
 
+    transactions = [dict(tx, date=parse_datetime_to_utc(tx["date"])) for tx in data["transactions"]]
+    apply_trade_aggregates(trade, transactions)
+
     parsed_transactions = []
-    for tx in data["transactions"]:
-        date = parse_datetime_to_utc(tx["date"])
+    for tx in transactions:
+        date = tx["date"]
         parsed_transactions.append((date, tx["type"]))
 
         transaction = models.TradeTransaction(
@@ -152,7 +429,8 @@ def update_trade(db:Session, trade_id: int, user_id: str, data: dict):
             date=date,
             amount=tx["amount"],
             price=tx["price"],
-            commissions=tx["commissions"]
+            commissions=tx["commissions"],
+            realized_pnl=tx["realized_pnl"],
         )
         db.add(transaction)
 
@@ -166,7 +444,8 @@ def update_trade(db:Session, trade_id: int, user_id: str, data: dict):
     trade.earliest_transaction = earliest_transaction
     trade.latest_transaction = latest_transaction
     trade.trade_type = trade_type
-
+    trade.fingerprint = transactions_fingerprint(transactions)
+    apply_rollup_changes(db, user_id, removed=[previous], added=[rollup_contribution(trade, realized_fills(transactions))])
 
     db.commit()
     db.refresh(trade)
@@ -174,16 +453,6 @@ def update_trade(db:Session, trade_id: int, user_id: str, data: dict):
 
 from collections import Counter
 
-def _trade_net_shares(trade: models.Trade) -> float:
-    net = 0.0
-    for tx in trade.transactions:
-        amt = float(tx.amount)
-        if (tx.type or "").lower() == "buy":
-            net += amt
-        else:
-            net -= amt
-    return net
-
 def _norm_is_subset(existing_norm: tuple, new_norm: tuple) -> bool:
     a = Counter(existing_norm)
     b = Counter(new_norm)
@@ -198,25 +467,29 @@ def upsert_trade_from_import(
     transactions: list,
     preserve_existing_notes_and_mistake: bool = True,
 ):
-    new_norm = normalise_transactions_for_compare(transactions)
+    ticker = normalise_ticker(ticker)
+    fingerprint = transactions_fingerprint(transactions)
+
+    # If its an exact duplicate, return existing
+    existing = find_trade_by_fingerprint(db, user_id, ticker, fingerprint)
+    if existing:
+        return existing
 
-    existing_trades = (
+    # Or merge into an existing open trade
+    new_norm = normalise_transactions_for_compare(transactions)
+    open_trades = (
         db.query(models.Trade)
-        .filter(models.Trade.user_id == user_id, models.Trade.ticker == ticker)
+        .options(selectinload(models.Trade.transactions))
+        .filter(
+            models.Trade.user_id == user_id,
+            models.Trade.ticker == ticker,
+            models.Trade.status == "Open",
+        )
         .all()
     )
 
-    # If its an exact duplicate, return existing
-    for existing in existing_trades:
-        if normalise_transactions_for_compare(existing.transactions) == new_norm:
-            return existing
-
-    # Or merge into existing trade
     candidates = []
-    for existing in existing_trades:
-        if abs(_trade_net_shares(existing)) < 1e-8:
-            continue
-
+    for existing in open_trades:
         existing_norm = normalise_transactions_for_compare(existing.transactions)
         if _norm_is_subset(existing_norm, new_norm):
             candidates.append((len(existing_norm), existing))
@@ -242,3 +515,205 @@ def upsert_trade_from_import(
         notes=notes,
         transactions=transactions,
     )
+
+
+def _chunked(items: list, size: int = 500):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+def _trade_window(transactions: list):
+    """
+    Earliest/latest transaction dates and the trade direction,
+    taken from the earliest transaction
+    """
+    earliest = None
+    latest = None
+    trade_type = "Long"
+
+    for tx in transactions:
+        date = tx["date"]
+        if latest is None or date > latest:
+            latest = date
+        if earliest is None or date < earliest:
+            earliest = date
+            trade_type = "Long" if tx["type"] == "buy" else "Short"
+
+    return earliest, latest, trade_type
+
+# Written by _insert_new_trades, every column but the id
+TRADE_INSERT_COLUMNS = [c.key for c in models.Trade.__table__.columns if c.key != "id"]
+
+def _insert_new_trades(db: Session, new_trades: list):
+    """
+    Insert new Trade objects in multi-row INSERTs and give them their
+    ids. Adding them to the session would flush one INSERT per trade,
+    since the ORM can't match multi-row RETURNING to objects on sqlite.
+    Within a batch (ticker, fingerprint) is unique, so it's used instead.
+    """
+    by_key = {(trade.ticker, trade.fingerprint): trade for trade in new_trades}
+    rows = [{column: getattr(trade, column) for column in TRADE_INSERT_COLUMNS} for trade in new_trades]
+
+    stmt = (
+        insert(models.Trade)
+        .returning(models.Trade.id, models.Trade.ticker, models.Trade.fingerprint)
+        .execution_options(render_nulls=True)
+    )
+    for chunk in _chunked(rows, 1000):
+        for trade_id, ticker, fingerprint in db.execute(stmt, chunk):
+            by_key[(ticker, fingerprint)].id = trade_id
+
+def import_trades_batch(
+    db: Session,
+    user_id: str,
+    trades: list,
+    preserve_existing_notes_and_mistake: bool = True,
+):
+    """
+    Import a whole batch of parsed trades in a single transaction.
+
+    Duplicates and merges into open trades are resolved in memory
+    against one fingerprint lookup and one load of the open trades,
+    then trades and transactions are written with bulk inserts.
+
+    Returns one {"trade_id", "ticker", "action"} dict per input trade,
+    in input order, where action is "created", "merged" or "skipped".
+    Trades with no transactions are skipped with a trade_id of None.
+    """
+    prepared = []
+    for t in trades:
+        txs = [
+            {
+                "type": tx["type"],
+                "date": parse_datetime_to_utc(tx["date"]),
+                "amount": float(tx["amount"]),
+                "price": float(tx["price"]),
+                "commissions": float(tx.get("commissions") or 0),
+            }
+            for tx in t["transactions"]
+        ]
+        fingerprint = transactions_fingerprint(txs) if txs else None
+        prepared.append((t, normalise_ticker(t["ticker"]), txs, fingerprint))
+
+    tickers = sorted({ticker for _t, ticker, txs, _fp in prepared if txs})
+    fingerprints = sorted({fp for _t, _ticker, txs, fp in prepared if txs})
+
+    # Exact duplicates already in the journal
+    existing_ids = {}
+    for chunk in _chunked(fingerprints):
+        rows = (
+            db.query(models.Trade.id, models.Trade.ticker, models.Trade.fingerprint)
+            .filter(models.Trade.user_id == user_id, models.Trade.fingerprint.in_(chunk))
+            .all()
+        )
+        for trade_id, ticker, fp in rows:
+            existing_ids.setdefault((ticker, fp), trade_id)
+
+    # Open trades that an imported trade may extend, as (norm, trade,
+    # realized fills). Trades this batch leaves open go back in, so a
+    # later row can extend them again.
+    open_by_ticker = {}
+    for chunk in _chunked(tickers):
+        open_trades = (
+            db.query(models.Trade)
+            .options(selectinload(models.Trade.transactions))
+            .filter(
+                models.Trade.user_id == user_id,
+                models.Trade.ticker.in_(chunk),
+                models.Trade.status == "Open",
+            )
+            .all()
+        )
+        for trade in open_trades:
+            norm = normalise_transactions_for_compare(trade.transactions)
+            fills = [(tx.date, tx.realized_pnl) for tx in trade.transactions if tx.realized_pnl is not None]
+            open_by_ticker.setdefault(trade.ticker, []).append((norm, trade, fills))
+
+    results = []
+    # trade -> the transactions it ends up with
+    written = {}
+    new_trades = []
+    merged_ids = []
+    rollup_removed = []
+    rollup_added = []
+
+    for t, ticker, txs, fp in prepared:
+        if not txs:
+            results.append((None, ticker, "skipped"))
+            continue
+
+        mistake = t.get("mistake", "Imported from broker CSV")
+        notes = t.get("notes", "")
+
+        key = (ticker, fp)
+        if key in existing_ids:
+            results.append((existing_ids[key], ticker, "skipped"))
+            continue
+
+        new_norm = normalise_transactions_for_compare(txs)
+        candidates = [
+            (len(norm), trade, fills)
+            for norm, trade, fills in open_by_ticker.get(ticker, [])
+            if _norm_is_subset(norm, new_norm)
+        ]
+
+        if candidates:
+            candidates.sort(key=lambda x: x[0], reverse=True)
+            _, trade, fills = candidates[0]
+            open_by_ticker[ticker] = [c for c in open_by_ticker[ticker] if c[1] is not trade]
+            rollup_removed.append(rollup_contribution(trade, fills))
+
+            if not preserve_existing_notes_and_mistake:
+                trade.mistake = mistake
+                trade.notes = notes
+            # Stored transactions are replaced once, trades created or
+            # merged earlier in the batch only have their new ones in written
+            if trade.id is not None and trade not in written:
+                merged_ids.append(trade.id)
+            action = "merged"
+        else:
+            trade = models.Trade(user_id=user_id, ticker=ticker, mistake=mistake, notes=notes)
+            new_trades.append(trade)
+            action = "created"
+
+        trade.earliest_transaction, trade.latest_transaction, trade.trade_type = _trade_window(txs)
+        trade.fingerprint = fp
+        apply_trade_aggregates(trade, txs)
+        rollup_added.append(rollup_contribution(trade, realized_fills(txs)))
+
+        existing_ids[key] = trade
+        written[trade] = txs
+        results.append((trade, ticker, action))
+
+        if trade.status == "Open":
+            open_by_ticker.setdefault(ticker, []).append((new_norm, trade, realized_fills(txs)))
+
+    db.flush()
+    _insert_new_trades(db, new_trades)
+
+    for chunk in _chunked(merged_ids):
+        (
+            db.query(models.TradeTransaction)
+            .filter(models.TradeTransaction.trade_id.in_(chunk))
+            .delete(synchronize_session=False)
+        )
+
+    tx_rows = [
+        {"trade_id": trade.id, **tx}
+        for trade, txs in written.items()
+        for tx in txs
+    ]
+    if tx_rows:
+        # render_nulls keeps fills with and without realized PnL in one
+        # executemany, the ORM would otherwise split them by which keys are None
+        db.execute(insert(models.TradeTransaction).execution_options(render_nulls=True), tx_rows)
+
+    apply_rollup_changes(db, user_id, removed=rollup_removed, added=rollup_added)
+
+    # Trades written in this batch only have ids after the flush
+    resolved = [
+        {"trade_id": getattr(ref, "id", ref), "ticker": ticker, "action": action}
+        for ref, ticker, action in results
+    ]
+
+    db.commit()
+    return resolved
@@ -0,0 +1,90 @@
+"""
+Lot matching for realized PnL. A trade's transactions are walked once
+in date order. Buys and sells that grow the position open lots, and
+fills against the position close lots FIFO or at average cost. A fill
+that goes through flat closes the position and opens the rest the
+other way.
+
+Commissions on an opening fill go into that lot's cost, and
+commissions on a closing fill are charged when the fill happens. A
+trade that ends flat therefore realizes sells - buys - commissions in
+total, whichever method is used.
+"""
+import os
+from collections import deque
+from typing import List, Optional
+
+LOT_METHODS = ("fifo", "average")
+
+# Applies to trades as they're written. Changing it doesn't touch the
+# PnL already stored, see migrations._0006_realized_pnl_per_fill.
+LOT_METHOD = os.getenv("LOT_METHOD", "fifo").lower()
+
+LOT_EPSILON = 1e-9
+
+
+def match_lots(transactions: list, method: str = None) -> List[Optional[float]]:
+    """
+    Realized PnL of each transaction dict (type, date, amount, price,
+    commissions), in the order given. None for fills that only open
+    or add to the position.
+    """
+    method = method or LOT_METHOD
+    if method not in LOT_METHODS:
+        raise ValueError(f"Unknown lot method: {method}")
+
+    realized: List[Optional[float]] = [None] * len(transactions)
+    # [shares left, cost per share with the opening commission spread in]
+    lots = deque()
+    side = 0  # 1 long, -1 short, 0 flat
+
+    # Stable, so fills at the same time keep their order. Imports are
+    # already in date order, which timsort goes through in one pass.
+    order = sorted(range(len(transactions)), key=lambda i: transactions[i]["date"])
+    for i in order:
+        tx = transactions[i]
+        amount = float(tx["amount"])
+        price = float(tx["price"])
+        commissions = float(tx.get("commissions") or 0)
+        direction = 1 if tx["type"] == "buy" else -1
+
+        if amount <= LOT_EPSILON:
+            if commissions:
+                realized[i] = -commissions
+            continue
+
+        if side == 0 or side == direction:
+            _open_lot(lots, method, amount, price + direction * commissions / amount)
+            side = direction
+            continue
+
+        pnl = 0.0
+        remaining = amount
+        while remaining > LOT_EPSILON and lots:
+            lot = lots[0]
+            closed = min(remaining, lot[0])
+            pnl += side * closed * (price - lot[1])
+            lot[0] -= closed
+            remaining -= closed
+            if lot[0] <= LOT_EPSILON:
+                lots.popleft()
+
+        closed_share = (amount - remaining) / amount
+        realized[i] = pnl - commissions * closed_share
+
+        if remaining > LOT_EPSILON:
+            # Through flat, what's left opens a position the other way
+            _open_lot(lots, method, remaining, price + direction * commissions * (1 - closed_share) / remaining)
+            side = direction
+        elif not lots:
+            side = 0
+
+    return realized
+
+
+def _open_lot(lots: deque, method: str, shares: float, cost: float):
+    if method == "average" and lots:
+        held, average = lots[0]
+        lots[0] = [held + shares, (held * average + shares * cost) / (held + shares)]
+    else:
+        lots.append([shares, cost])
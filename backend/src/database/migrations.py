@@ -0,0 +1,249 @@
+from itertools import groupby
+from sqlalchemy import inspect, text
+from .lots import match_lots
+from .normalise import transactions_fingerprint
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return any(col["name"] == column for col in inspect(conn).get_columns(table))
+
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    if not _has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _0001_trade_aggregates(conn):
+    """
+    Store per-trade totals on the trades table so listings
+    don't have to load every transaction
+    """
+    _add_column(conn, "trades", "net_shares", "FLOAT NOT NULL DEFAULT 0")
+    _add_column(conn, "trades", "buy_notional", "FLOAT NOT NULL DEFAULT 0")
+    _add_column(conn, "trades", "sell_notional", "FLOAT NOT NULL DEFAULT 0")
+    _add_column(conn, "trades", "total_commissions", "FLOAT NOT NULL DEFAULT 0")
+    _add_column(conn, "trades", "realized_pnl", "FLOAT")
+    _add_column(conn, "trades", "status", "VARCHAR NOT NULL DEFAULT 'Open'")
+
+    # Backfill existing rows in one pass over trade_transactions
+    conn.execute(text("""
+        UPDATE trades SET
+            net_shares = COALESCE(agg.net_shares, 0),
+            buy_notional = COALESCE(agg.buy_notional, 0),
+            sell_notional = COALESCE(agg.sell_notional, 0),
+            total_commissions = COALESCE(agg.total_commissions, 0)
+        FROM (
+            SELECT
+                trade_id,
+                SUM(CASE WHEN type = 'buy' THEN amount ELSE -amount END) AS net_shares,
+                SUM(CASE WHEN type = 'buy' THEN amount * price ELSE 0 END) AS buy_notional,
+                SUM(CASE WHEN type = 'sell' THEN amount * price ELSE 0 END) AS sell_notional,
+                SUM(commissions) AS total_commissions
+            FROM trade_transactions
+            GROUP BY trade_id
+        ) AS agg
+        WHERE agg.trade_id = trades.id
+    """))
+    conn.execute(text("""
+        UPDATE trades SET
+            status = CASE WHEN ABS(net_shares) < :eps THEN 'Closed' ELSE 'Open' END,
+            realized_pnl = CASE
+                WHEN ABS(net_shares) < :eps THEN sell_notional - buy_notional - total_commissions
+                ELSE NULL
+            END
+    """), {"eps": 1e-9})
+
+
+def _0002_trade_fingerprints(conn):
+    """
+    Hash each trade's normalised transactions so duplicate
+    detection can use an index instead of comparing every trade
+    """
+    _add_column(conn, "trades", "fingerprint", "VARCHAR(64)")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_trades_user_ticker_fingerprint "
+        "ON trades (user_id, ticker, fingerprint)"
+    ))
+
+    rows = conn.execute(text(
+        "SELECT trade_id, date, type, amount, price, commissions "
+        "FROM trade_transactions ORDER BY trade_id"
+    )).mappings()
+
+    updates = []
+    for trade_id, txs in groupby(rows, key=lambda r: r["trade_id"]):
+        updates.append({"id": trade_id, "fingerprint": transactions_fingerprint([dict(tx) for tx in txs])})
+
+    if updates:
+        conn.execute(text("UPDATE trades SET fingerprint = :fingerprint WHERE id = :id"), updates)
+
+
+def _0003_daily_pnl(conn):
+    """
+    Used to build the daily_pnl rollup from the trade aggregates. The
+    table is created by create_all in its current shape, which the old
+    query didn't fill in, and _0007 rebuilds the rollup, so there's
+    nothing left to do here.
+    """
+
+
+def _0004_query_indexes(conn):
+    """
+    Indexes for the trade list, the dashboard and per-trade transaction
+    loads. Lookups by (user_id, ticker) already use the leading columns
+    of ix_trades_user_ticker_fingerprint.
+    """
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_trades_user_latest "
+        "ON trades (user_id, latest_transaction)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_trade_transactions_trade_date "
+        "ON trade_transactions (trade_id, date)"
+    ))
+
+
+def _0005_trade_list_ticker_index(conn):
+    """
+    Serve the trade list filtered by ticker straight off an index
+    in listing order
+    """
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_trades_user_ticker_latest "
+        "ON trades (user_id, ticker, latest_transaction)"
+    ))
+
+
+def rebuild_daily_pnl(conn):
+    """
+    Recompute the daily_pnl rollup from the stored per-fill PnL and
+    trade aggregates, the same way the write paths maintain it
+    """
+    conn.execute(text("DELETE FROM daily_pnl"))
+    conn.execute(text("""
+        INSERT INTO daily_pnl (user_id, day, mistake, ticker, realized_pnl, trade_count, wins, losses, commissions)
+        SELECT user_id, day, mistake_key, ticker, SUM(pnl), SUM(closed), SUM(win), SUM(loss), SUM(commissions)
+        FROM (
+            SELECT
+                t.user_id,
+                date(tx.date) AS day,
+                COALESCE(NULLIF(TRIM(t.mistake), ''), 'None') AS mistake_key,
+                t.ticker,
+                tx.realized_pnl AS pnl,
+                0 AS closed, 0 AS win, 0 AS loss, 0 AS commissions
+            FROM trade_transactions tx
+            JOIN trades t ON t.id = tx.trade_id
+            WHERE tx.realized_pnl IS NOT NULL
+            UNION ALL
+            SELECT
+                user_id,
+                date(COALESCE(latest_transaction, earliest_transaction)),
+                COALESCE(NULLIF(TRIM(mistake), ''), 'None'),
+                ticker,
+                0,
+                1,
+                CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END,
+                CASE WHEN realized_pnl < 0 THEN 1 ELSE 0 END,
+                total_commissions
+            FROM trades
+            WHERE status = 'Closed'
+                AND COALESCE(latest_transaction, earliest_transaction) IS NOT NULL
+        )
+        GROUP BY user_id, day, mistake_key, ticker
+    """))
+
+
+def _0006_realized_pnl_per_fill(conn):
+    """
+    Lot-match every trade to store the PnL each fill realized, so
+    partly closed trades have PnL and daily_pnl counts it on the day
+    shares were closed rather than when the trade went flat. Running
+    it again recomputes everything with the current LOT_METHOD.
+    daily_pnl is rebuilt from the result by _0007.
+    """
+    _add_column(conn, "trade_transactions", "realized_pnl", "FLOAT")
+
+    rows = conn.execute(text(
+        "SELECT id, trade_id, type, date, amount, price, commissions "
+        "FROM trade_transactions ORDER BY trade_id, date, id"
+    )).mappings()
+
+    tx_updates = []
+    trade_updates = []
+    for trade_id, txs in groupby(rows, key=lambda r: r["trade_id"]):
+        txs = [dict(tx) for tx in txs]
+        realized = match_lots(txs)
+        tx_updates.extend({"id": tx["id"], "pnl": pnl} for tx, pnl in zip(txs, realized))
+        fills = [pnl for pnl in realized if pnl is not None]
+        trade_updates.append({"id": trade_id, "pnl": sum(fills) if fills else None})
+
+    if tx_updates:
+        conn.execute(text("UPDATE trade_transactions SET realized_pnl = :pnl WHERE id = :id"), tx_updates)
+    if trade_updates:
+        # Closed trades always have PnL, as apply_trade_aggregates sets it
+        conn.execute(text(
+            "UPDATE trades SET realized_pnl = COALESCE(:pnl, CASE WHEN status = 'Closed' THEN 0 END) WHERE id = :id"
+        ), trade_updates)
+
+
+def _0007_daily_pnl_by_ticker(conn):
+    """
+    Key daily_pnl by ticker as well so the dashboard can be narrowed to
+    one ticker. sqlite can't change a unique constraint in place, and
+    the rollup can always be rebuilt, so the table is recreated.
+    """
+    # models imports this module, it's fully loaded by the time migrations run
+    from .models import DailyPnl
+
+    if not _has_column(conn, "daily_pnl", "ticker"):
+        conn.execute(text("DROP TABLE daily_pnl"))
+        DailyPnl.__table__.create(conn)
+
+    rebuild_daily_pnl(conn)
+
+
+def _0008_upper_case_tickers(conn):
+    """
+    Tickers are stored in upper case now, which the ticker filters rely
+    on. Convert the ones typed in before, and rebuild the rollup since
+    it's keyed by ticker.
+    """
+    changed = conn.execute(text(
+        "UPDATE trades SET ticker = UPPER(TRIM(ticker)) WHERE ticker != UPPER(TRIM(ticker))"
+    )).rowcount
+    if changed:
+        rebuild_daily_pnl(conn)
+
+
+def _0009_import_job_results(conn):
+    """
+    Keep each import job's per-trade results for GET /import-jobs/{id}
+    """
+    _add_column(conn, "import_jobs", "results", "JSON")
+
+
+# Applied in order, the index into this list is stored in PRAGMA user_version
+MIGRATIONS = [
+    _0001_trade_aggregates,
+    _0002_trade_fingerprints,
+    _0003_daily_pnl,
+    _0004_query_indexes,
+    _0005_trade_list_ticker_index,
+    _0006_realized_pnl_per_fill,
+    _0007_daily_pnl_by_ticker,
+    _0008_upper_case_tickers,
+    _0009_import_job_results,
+]
+
+
+def run_migrations(engine):
+    """
+    Bring an existing sqlite database up to date with the models.
+    Each migration runs once, tracked by PRAGMA user_version
+    """
+    with engine.begin() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+        for i, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {i}"))
@@ -3,25 +3,73 @@ from sqlalchemy import (
     Integer,
     String,
     DateTime,
+    Date,
     create_engine,
     Enum,
     Text,
     ForeignKey,
     Float,
+    Index,
+    Boolean,
+    UniqueConstraint,
+    JSON,
     event,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.engine import Engine
 from datetime import datetime
+from functools import partial
+import os
+import sqlite3
+import anyio
+from .migrations import run_migrations
 
-engine = create_engine("sqlite:///database.db", echo=True)
+
+def _env_flag(name: str, default: str = "") -> bool:
+    return os.getenv(name, default).lower() in {"1", "true", "yes"}
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+DB_ECHO = _env_flag("DB_ECHO")
+
+# Storage profile, applied to every new sqlite connection. WAL lets the
+# dashboard read while an import writes, NORMAL is still durable in WAL
+# mode apart from the last commits on power loss.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative means KiB rather than pages
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+
+# In-memory sqlite gets a single connection per thread, there's no pool to size
+_pool_args = {} if DATABASE_URL in ("sqlite://", "sqlite:///:memory:") else {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_pre_ping": not DATABASE_URL.startswith("sqlite"),
+}
+
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, **_pool_args)
 
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
     cursor = dbapi_connection.cursor()
     try:
         cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
     finally:
         cursor.close()
 
@@ -40,6 +88,19 @@ class Trade(Base):
     notes = Column(Text)
     latest_transaction = Column(DateTime, nullable=True)
     earliest_transaction = Column(DateTime, nullable=True)
+
+    # Aggregates over transactions, kept up to date on every write in db.py
+    net_shares = Column(Float, nullable=False, default=0.0)
+    buy_notional = Column(Float, nullable=False, default=0.0)
+    sell_notional = Column(Float, nullable=False, default=0.0)
+    total_commissions = Column(Float, nullable=False, default=0.0)
+    # Sum of the transactions' realized PnL, None until something is closed
+    realized_pnl = Column(Float, nullable=True)
+    status = Column(String, nullable=False, default="Open")
+
+    # sha256 of the normalised transactions, used for duplicate detection
+    fingerprint = Column(String(64), nullable=True)
+
     transactions = relationship(
         "TradeTransaction",
         back_populates="trade",
@@ -47,6 +108,12 @@ class Trade(Base):
         passive_deletes=True,
     )
 
+    __table_args__ = (
+        Index("ix_trades_user_ticker_fingerprint", "user_id", "ticker", "fingerprint"),
+        Index("ix_trades_user_latest", "user_id", "latest_transaction"),
+        Index("ix_trades_user_ticker_latest", "user_id", "ticker", "latest_transaction"),
+    )
+
 
 class TradeTransaction(Base):
     __tablename__ = "trade_transactions"
@@ -58,9 +125,102 @@ class TradeTransaction(Base):
     amount = Column(Float, nullable=False)
     price = Column(Float, nullable=False)
     commissions = Column(Float, nullable=False, default=0.00)
+    # PnL this fill realized by closing shares (see lots.py), None if it only opened
+    realized_pnl = Column(Float, nullable=True)
 
     trade = relationship("Trade", back_populates="transactions")
 
+    __table_args__ = (
+        Index("ix_trade_transactions_trade_date", "trade_id", "date"),
+    )
+
+
+class DailyPnl(Base):
+    """
+    Realized PnL per user, day, mistake and ticker, from every fill that
+    closed shares that day, and closed trades counted on the day they
+    closed. Maintained incrementally by the trade write paths.
+    """
+    __tablename__ = "daily_pnl"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    mistake = Column(String, nullable=False)
+    ticker = Column(String, nullable=False)
+    realized_pnl = Column(Float, nullable=False, default=0.0)
+    trade_count = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    commissions = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        # Also serves date ranges over all of a user's tickers
+        UniqueConstraint("user_id", "day", "mistake", "ticker", name="uq_daily_pnl_user_day_mistake_ticker"),
+        Index("ix_daily_pnl_user_ticker_day", "user_id", "ticker", "day"),
+    )
+
+
+class DailyBar(Base):
+    """
+    Daily OHLC bars from Alpha Vantage, shared by every user
+    """
+    __tablename__ = "daily_bars"
+
+    symbol = Column(String, primary_key=True)
+    date = Column(String, primary_key=True)  # YYYY-MM-DD
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+
+
+class MarketDataFetch(Base):
+    __tablename__ = "market_data_fetches"
+
+    symbol = Column(String, primary_key=True)
+    fetched_at = Column(DateTime, nullable=True)
+    full_history = Column(Boolean, nullable=False, default=False)
+
+
+class ImportJob(Base):
+    """
+    A CSV import run in the background by src/import_jobs.py.
+    The upload is kept on disk at file_path until the job finishes.
+    """
+    __tablename__ = "import_jobs"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String, nullable=False)
+    filename = Column(String, nullable=True)
+    file_path = Column(String, nullable=False)
+    # Requested broker format, None to detect it from the header
+    broker = Column(String, nullable=True)
+
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    stage = Column(String, nullable=True)  # parsing, importing
+    parser = Column(String, nullable=True)  # broker format name or "ai"
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # Progress of the current stage, AI requests while parsing and trades while importing
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+
+    created = Column(Integer, nullable=False, default=0)
+    merged = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    # {"trade_id", "ticker", "action"} per imported trade, once the job has finished
+    results = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_import_jobs_status_created", "status", "created_at"),
+    )
+
 
 class Challenge(Base):
     __tablename__ = "challenges"
@@ -85,6 +245,7 @@ class ChallengeQuota(Base):
 
 
 Base.metadata.create_all(engine)
+run_migrations(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -95,3 +256,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Worker threads that may run database work at once. Imports and other
+# bulk writes get a smaller share so they can't hold every thread.
+DB_THREADS = int(os.getenv("DB_THREADS", 8))
+DB_BULK_THREADS = int(os.getenv("DB_BULK_THREADS", 2))
+
+_db_limiter = anyio.CapacityLimiter(DB_THREADS)
+_bulk_limiter = anyio.CapacityLimiter(DB_BULK_THREADS)
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run blocking database work in a worker thread so the event loop
+    keeps serving other requests while it waits on sqlite
+    """
+    return await anyio.to_thread.run_sync(partial(fn, *args, **kwargs), limiter=_db_limiter)
+
+
+async def run_bulk_db(fn, *args, **kwargs):
+    """
+    run_db for imports and other long writes
+    """
+    return await anyio.to_thread.run_sync(partial(fn, *args, **kwargs), limiter=_bulk_limiter)
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+import hashlib
+import json
+
+def parse_datetime_to_utc(dt_input):
+    """
+    Normalise various datetime formats to a UTC datetime for sqlite
+    """
+
+    if isinstance(dt_input, datetime):
+        dt = dt_input
+    elif isinstance(dt_input, str):
+        s = dt_input.strip()
+
+        if s.endswith(" UTC"):
+            s = s[:-4].strip()
+
+        if s.endswith("Z"):
+            s = s[:-1] + "+00:00"
+
+        if len(s) == 10 and s[4] == "-" and s[7] == "-":
+            s = s + "T00:00:00"
+
+        dt = datetime.fromisoformat(s)
+    else:
+        raise TypeError("Unsupported datetime input")
+
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    else:
+        dt = dt.astimezone(timezone.utc)
+
+    return dt.replace(tzinfo=None)
+
+def normalise_ticker(ticker: str) -> str:
+    """
+    Tickers are stored and filtered on in upper case
+    """
+    return ticker.strip().upper()
+
+def normalise_transactions_for_compare(transactions):
+    """
+    Turn a list of transactions into a sorted 
+    representation for comparison
+    """
+    norm = []
+
+    for tx in transactions:
+        if isinstance(tx, dict):
+            dt_in = tx["date"]
+            tx_type = tx["type"]
+            amount = float(tx["amount"])
+            price = float(tx["price"])
+            commissions = float(tx.get("commissions") or 0)
+        else:
+            dt_in = tx.date
+            tx_type = tx.type
+            amount = float(tx.amount)
+            price = float(tx.price)
+            commissions = float(tx.commissions)
+
+        dt = parse_datetime_to_utc(dt_in)
+
+        norm.append(
+            (
+                dt.isoformat(timespec="microseconds"),
+                tx_type.lower(),
+                round(amount, 8),
+                round(price, 8),
+                round(commissions, 8),
+            )
+        )
+
+    norm.sort()
+    return tuple(norm)
+
+def transactions_fingerprint(transactions) -> str:
+    """
+    Stable hash of the normalised transactions, stored on the trade
+    so duplicate checks are a single indexed lookup
+    """
+    norm = normalise_transactions_for_compare(transactions)
+    payload = json.dumps(norm, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,106 @@
+"""
+Count the SQL statements a block of code runs and the time spent in
+them, to catch N+1 query patterns.
+
+Statements are attributed through a context variable. Route work run
+with run_db / run_in_threadpool copies the request's context into the
+worker thread, so its queries count towards the request. Import jobs
+run outside any request and aren't counted.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self, record: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        # The statements themselves, only kept when asked for
+        self.statements: Optional[List[str]] = [] if record else None
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["query_stats_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    start = conn.info.pop("query_stats_start", None)
+    if stats is None or start is None:
+        return
+
+    stats.count += 1
+    stats.seconds += time.perf_counter() - start
+    if stats.statements is not None:
+        stats.statements.append(statement)
+
+
+@contextmanager
+def collect_queries(record: bool = False):
+    """
+    Count the statements run inside the block, on this thread and on
+    worker threads it hands work to
+    """
+    stats = QueryStats(record)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "block"):
+    """
+    Fail with the statements that ran if the block runs more than
+    limit of them. For checks and tests:
+
+        with assert_max_queries(3):
+            _list_trades(db, user_id, 50, None, filters)
+    """
+    with collect_queries(record=True) as stats:
+        yield stats
+
+    if stats.count > limit:
+        statements = "\n".join(f"  {' '.join(s.split())[:160]}" for s in stats.statements)
+        raise AssertionError(f"{label} ran {stats.count} SQL statements, expected at most {limit}:\n{statements}")
+
+
+class QueryStatsMiddleware:
+    """
+    Adds X-SQL-Queries and X-SQL-Time-ms to every response, for
+    debugging. Streaming responses only count the queries run before
+    their headers went out.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with collect_queries() as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-sql-queries", str(stats.count).encode()))
+                    headers.append((b"x-sql-time-ms", f"{stats.seconds * 1000:.2f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
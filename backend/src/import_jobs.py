@@ -0,0 +1,262 @@
+"""
+Background CSV imports.
+
+Uploads are written to IMPORT_DIR and an ImportJob row is queued, the
+request returns straight away. A small pool of threads in this process
+parses and imports the files, recording progress on the job row as it
+goes. Jobs still queued or running when the process stopped are picked
+up again on the next start. Re-running an import is safe, trades that
+already made it into the journal are matched by fingerprint and skipped.
+
+The pool belongs to the process, run one app process per database.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+from fastapi import HTTPException
+
+from .ai_generator import parse_trades_from_csv_with_ai
+from .database import models
+from .database.db import import_trades_batch
+from .parse_broker_statement import BROKERS, iter_broker_csv, sniff_broker_format
+
+IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))
+# Trades written per transaction, progress is reported between them
+IMPORT_BATCH_TRADES = int(os.getenv("IMPORT_BATCH_TRADES", 500))
+# A job that keeps taking the process down is failed rather than retried forever
+MAX_IMPORT_ATTEMPTS = 3
+
+_executor: Optional[ThreadPoolExecutor] = None
+log = logging.getLogger(__name__)
+
+
+def save_upload(stream) -> str:
+    """
+    Copy an upload into IMPORT_DIR, returning the new job id
+    """
+    job_id = uuid.uuid4().hex
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=IMPORT_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(stream, out)
+        os.replace(tmp_path, _upload_path(job_id))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return job_id
+
+
+def _upload_path(job_id: str) -> str:
+    return os.path.join(IMPORT_DIR, f"{job_id}.csv")
+
+
+def create_job(db, job_id: str, user_id: str, filename: Optional[str], broker: Optional[str]) -> models.ImportJob:
+    job = models.ImportJob(
+        id=job_id,
+        user_id=user_id,
+        filename=filename,
+        file_path=_upload_path(job_id),
+        broker=broker,
+        status="queued",
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def job_summary(job: models.ImportJob) -> dict:
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "stage": job.stage,
+        "parser": job.parser,
+        "progress": {"done": job.progress_done, "total": job.progress_total},
+        "created": job.created,
+        "merged": job.merged,
+        "skipped": job.skipped,
+        "count": job.created + job.merged + job.skipped,
+        "results": job.results,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def submit(job_id: str):
+    if _executor is None:
+        raise RuntimeError("Import workers aren't running")
+    _executor.submit(run_import_job, job_id)
+
+
+def start_import_workers():
+    """
+    Start the pool and requeue jobs left over from the last run
+    """
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+
+    db = models.SessionLocal()
+    try:
+        unfinished = (
+            db.query(models.ImportJob)
+            .filter(models.ImportJob.status.in_(["queued", "running"]))
+            .order_by(models.ImportJob.created_at)
+            .all()
+        )
+        resume = []
+        for job in unfinished:
+            if job.attempts >= MAX_IMPORT_ATTEMPTS:
+                _finish(job, "failed", f"Stopped after {job.attempts} interrupted attempts")
+                _discard_upload(job.file_path)
+            else:
+                job.status = "queued"
+                resume.append(job.id)
+        db.commit()
+    finally:
+        db.close()
+
+    if resume:
+        log.info("Resuming %d import job(s)", len(resume))
+    for job_id in resume:
+        submit(job_id)
+
+
+def stop_import_workers():
+    """
+    Wait for running jobs. Queued ones stay queued for the next start.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def run_import_job(job_id: str):
+    db = models.SessionLocal()
+    try:
+        # Claim the job, it may already have been run or picked up again
+        claimed = (
+            db.query(models.ImportJob)
+            .filter(models.ImportJob.id == job_id, models.ImportJob.status == "queued")
+            .update(
+                {
+                    "status": "running",
+                    "started_at": datetime.utcnow(),
+                    "attempts": models.ImportJob.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if not claimed:
+            return
+
+        job = db.get(models.ImportJob, job_id)
+        try:
+            _run(db, job)
+        except Exception as e:
+            db.rollback()
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            # Bad input is expected, tracebacks are for everything else
+            expected = isinstance(e, (HTTPException, ValueError))
+            log.warning("Import job failed: %s", detail, extra={"job_id": job_id}, exc_info=not expected)
+            job = db.get(models.ImportJob, job_id)
+            _finish(job, "failed", detail)
+        else:
+            _finish(job, "succeeded")
+        db.commit()
+        _discard_upload(job.file_path)
+    finally:
+        db.close()
+
+
+def _discard_upload(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _finish(job: models.ImportJob, status: str, error: Optional[str] = None):
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.utcnow()
+
+
+def _set_progress(db, job: models.ImportJob, stage: str, done: int, total: Optional[int]):
+    job.stage = stage
+    job.progress_done = done
+    job.progress_total = total
+    db.commit()
+
+
+def _next_batch(trades, fmt) -> list:
+    try:
+        return list(islice(trades, IMPORT_BATCH_TRADES))
+    except ValueError:
+        if fmt is None:
+            raise
+        raise ValueError(f"CSV doesn't look like a {fmt.name} export")
+
+
+def _run(db, job: models.ImportJob):
+    with open(job.file_path, "rb") as f:
+        if job.broker:
+            fmt = BROKERS.get(job.broker)
+            if fmt is None:
+                raise ValueError(f"Unsupported broker: {job.broker}")
+        else:
+            fmt = sniff_broker_format(f)
+
+        job.parser = fmt.name if fmt else "ai"
+        _set_progress(db, job, "parsing", 0, None)
+
+        if fmt is not None:
+            # Parsed while importing. Rows are sorted by time before any
+            # trade comes out, so there's no total, just trades imported.
+            trades = iter_broker_csv(f, fmt)
+            progress = lambda imported: (imported, None)
+        else:
+            csv_text = f.read().decode("utf-8", errors="ignore")
+            parsed = parse_trades_from_csv_with_ai(
+                csv_text, on_progress=lambda done, total: _set_progress(db, job, "parsing", done, total)
+            )
+            trades = iter(parsed)
+            progress = lambda imported: (imported, len(parsed))
+
+        # Batches commit on their own, a rerun skips what was already written
+        job.created = job.merged = job.skipped = 0
+        _set_progress(db, job, "importing", 0, progress(0)[1])
+        imported = 0
+        results = []
+        while True:
+            batch = _next_batch(trades, fmt)
+            if not batch:
+                break
+            for result in import_trades_batch(db=db, user_id=job.user_id, trades=batch):
+                setattr(job, result["action"], getattr(job, result["action"]) + 1)
+                results.append(result)
+            imported += len(batch)
+            _set_progress(db, job, "importing", *progress(imported))
+
+    if not imported:
+        raise ValueError("No trades parsed from CSV")
+
+    job.results = results
+
+    log.info(
+        "Import job finished",
+        extra={"job_id": job.id, "user_id": job.user_id, "parser": job.parser, "trades": imported},
+    )
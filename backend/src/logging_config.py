@@ -0,0 +1,145 @@
+"""
+Application logging. Records are handed to a queue on the calling
+thread and formatted and written by a background listener thread, so
+a log call on the request path costs a queue put. When the queue is
+full records are dropped rather than blocking the request, and counted
+in the log_records_dropped_total metric.
+
+Output is one JSON object per line by default (LOG_FORMAT=text for
+plain lines). Long messages and fields are cut to LOG_MAX_FIELD_CHARS.
+Verbose payload dumps go through debug_sample, which logs only a
+share of them even with DEBUG enabled.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from .metrics import Counter
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", 2000))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10_000))
+# Share of debug_sample calls that are logged
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 0.01))
+
+# Libraries that log every HTTP call at INFO. httpx request lines
+# include query strings, and the Alpha Vantage one has the API key.
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+
+# Attributes every LogRecord has, anything else was passed in extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+def truncate(value: str, limit: int = None) -> str:
+    limit = limit or LOG_MAX_FIELD_CHARS
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}...(+{len(value) - limit} chars)"
+
+
+def _extras(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+def _field(value):
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if not isinstance(value, str):
+        value = json.dumps(value, default=str, separators=(",", ":"))
+    return truncate(value)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage()),
+        }
+        for key, value in _extras(record).items():
+            entry[key] = _field(value)
+        if record.exc_info:
+            entry["exc"] = truncate(self.formatException(record.exc_info), LOG_MAX_FIELD_CHARS * 4)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = truncate(super().format(record), LOG_MAX_FIELD_CHARS * 4)
+        extras = " ".join(f"{key}={_field(value)}" for key, value in _extras(record).items())
+        return f"{line} {extras}" if extras else line
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is the listener's job, only pin the message down so
+        # later changes to its arguments don't show up in the log
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+def configure_logging():
+    """
+    Route the root logger through the queue. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers = [_NonBlockingQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Write out whatever is still queued and stop the listener thread
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def debug_sample(logger: logging.Logger, msg: str, *args, rate: float = None, **kwargs):
+    """
+    logger.debug for verbose dumps, logged for only a share of calls.
+    Costs nothing when DEBUG is off.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= (LOG_DEBUG_SAMPLE_RATE if rate is None else rate):
+        return
+    logger.debug(msg, *args, **kwargs)
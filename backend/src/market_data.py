@@ -0,0 +1,223 @@
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .alpha_vantage import RateLimited, client
+from .cache import SingleFlight
+from .database import models
+from .database.models import run_db
+
+PADDING_BEFORE = 100
+PADDING_AFTER = 20
+
+# Calendar days that comfortably hold the bar padding either side of a window
+CALENDAR_DAYS_BEFORE = 200
+CALENDAR_DAYS_AFTER = 60
+
+# outputsize=full is a premium Alpha Vantage feature, only use it when enabled
+FULL_HISTORY_ENABLED = os.getenv("ALPHA_VANTAGE_FULL_HISTORY", "").lower() in {"1", "true", "yes"}
+
+# Concurrent requests for the same symbol share one store refresh,
+# see get_candles_for_symbol
+upstream_fetches = SingleFlight()
+
+
+def store_bars(db: Session, symbol: str, time_series: Dict[str, Any]):
+    rows = [
+        {
+            "symbol": symbol,
+            "date": d[:10],
+            "open": float(bar["1. open"]),
+            "high": float(bar["2. high"]),
+            "low": float(bar["3. low"]),
+            "close": float(bar["4. close"]),
+        }
+        for d, bar in time_series.items()
+    ]
+    if not rows:
+        return
+
+    stmt = sqlite_insert(models.DailyBar)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol", "date"],
+        set_={
+            "open": stmt.excluded.open,
+            "high": stmt.excluded.high,
+            "low": stmt.excluded.low,
+            "close": stmt.excluded.close,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def _stored_range(db: Session, symbol: str):
+    return (
+        db.query(func.min(models.DailyBar.date), func.max(models.DailyBar.date))
+        .filter(models.DailyBar.symbol == symbol)
+        .one()
+    )
+
+
+def plan_fetch(db: Session, symbol: str, start: str, end: str):
+    """
+    Decide whether the store needs topping up for the bars around
+    [start, end]. Returns (outputsize or None, whether any bars are
+    stored). Alpha Vantage is called at most once per symbol per day,
+    plus one full history download if enabled and older bars are needed.
+    """
+    today = date.today()
+    wanted_start = (date.fromisoformat(start) - timedelta(days=CALENDAR_DAYS_BEFORE)).isoformat()
+    wanted_end = min(date.fromisoformat(end) + timedelta(days=30), today).isoformat()
+
+    first, last = _stored_range(db, symbol)
+    fetch = db.get(models.MarketDataFetch, symbol)
+
+    need_recent = last is None or last < wanted_end
+    need_older = (
+        FULL_HISTORY_ENABLED
+        and (first is None or first > wanted_start)
+        and not (fetch and fetch.full_history)
+    )
+    fetched_today = bool(fetch and fetch.fetched_at and fetch.fetched_at.date() == today)
+
+    if need_older:
+        return "full", first is not None
+    if need_recent and not fetched_today:
+        return "compact", first is not None
+    return None, first is not None
+
+
+def save_fetch(db: Session, symbol: str, time_series: Dict[str, Any], outputsize: str):
+    store_bars(db, symbol, time_series)
+
+    fetch = db.get(models.MarketDataFetch, symbol)
+    if fetch is None:
+        fetch = models.MarketDataFetch(symbol=symbol)
+        db.add(fetch)
+    fetch.fetched_at = datetime.now()
+    fetch.full_history = bool(fetch.full_history) or outputsize == "full"
+
+    db.commit()
+
+
+async def ensure_bars(db: Session, symbol: str, start: str, end: str):
+    outputsize, have_bars = await run_db(plan_fetch, db, symbol, start, end)
+    if outputsize is None:
+        return
+
+    try:
+        time_series = await client.get_daily_series(symbol, outputsize)
+    except RateLimited as e:
+        # Over quota, serve what's stored (possibly stale) instead
+        if have_bars:
+            return
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        # Serve whatever is stored rather than failing the chart
+        if have_bars:
+            return
+        raise
+
+    await run_db(save_fetch, db, symbol, time_series, outputsize)
+
+
+async def _ensure_window(db: Session, symbol: str, start: str, end: str) -> Tuple[str, str]:
+    await ensure_bars(db, symbol, start, end)
+    return start, end
+
+
+def load_bars(db: Session, symbol: str, start: str, end: str) -> List[models.DailyBar]:
+    """
+    Stored bars from enough calendar days either side of the window
+    to cover the padding, sorted by date
+    """
+    lower = (date.fromisoformat(start) - timedelta(days=CALENDAR_DAYS_BEFORE)).isoformat()
+    upper = (date.fromisoformat(end) + timedelta(days=CALENDAR_DAYS_AFTER)).isoformat()
+
+    return (
+        db.query(models.DailyBar)
+        .filter(
+            models.DailyBar.symbol == symbol,
+            models.DailyBar.date >= lower,
+            models.DailyBar.date <= upper,
+        )
+        .order_by(models.DailyBar.date)
+        .all()
+    )
+
+
+def slice_window(bars: list, dates: List[str], start: str, end: str) -> List[Dict[str, Any]]:
+    """
+    Candles from PADDING_BEFORE bars before the first bar on/after start
+    to PADDING_AFTER bars after the last bar on/before end. dates must
+    be the sorted dates of bars.
+    """
+    first_idx = bisect_left(dates, start)
+    last_idx = bisect_right(dates, end) - 1
+
+    # If we cant find the trade window, return empty
+    if first_idx == len(dates) or last_idx < 0:
+        return []
+
+    from_idx = max(0, first_idx - PADDING_BEFORE)
+    to_idx = min(len(dates) - 1, last_idx + PADDING_AFTER)
+
+    return [
+        {
+            "time": bar.date,
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+        }
+        for bar in bars[from_idx : to_idx + 1]
+    ]
+
+
+def parse_window(start_date: str, end_date: str) -> Tuple[str, str]:
+    """
+    Normalise incoming dates to YYYY-MM-DD
+    """
+    start = start_date[:10]
+    end = end_date[:10]
+
+    try:
+        date.fromisoformat(start)
+        date.fromisoformat(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date and end_date must be YYYY-MM-DD")
+
+    return start, end
+
+
+async def get_candles_for_symbol(db: Session, symbol: str, windows: List[Tuple[str, str]]) -> List[List[Dict[str, Any]]]:
+    """
+    Candle sets for several parsed (start, end) windows on one symbol,
+    from a single store refresh and a single load of the bars
+    """
+    symbol = symbol.upper()
+    lo = min(start for start, _end in windows)
+    hi = max(end for _start, end in windows)
+
+    # A flight joined from another request only covered its own range,
+    # go again (planned against what's stored now) if ours is wider
+    while True:
+        covered_lo, covered_hi = await upstream_fetches.do(symbol, _ensure_window, db, symbol, lo, hi)
+        if covered_lo <= lo and hi <= covered_hi:
+            break
+
+    bars = await run_db(load_bars, db, symbol, lo, hi)
+    dates = [bar.date for bar in bars]
+    return [slice_window(bars, dates, start, end) for start, end in windows]
+
+
+async def get_candles(db: Session, symbol: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    window = parse_window(start_date, end_date)
+    candle_sets = await get_candles_for_symbol(db, symbol, [window])
+    return candle_sets[0]
@@ -1,132 +1,406 @@
 from __future__ import annotations
 
 import csv
+import heapq
+import io
+import pickle
+import tempfile
 from datetime import datetime
-from typing import List, Dict, Any
-from itertools import groupby
+from typing import List, Dict, Any, Callable, FrozenSet, Iterable, Iterator, NamedTuple, Optional, TextIO, Tuple
 
 
-def parse_tradezero_csv(csv_text: str) -> List[Dict[str, Any]]:
-    """
-    Parse a TradeZero 'Trade History' CSV export into the unified trade
-    structure used by the app.
+# Rows held in memory before a sorted run is spilled to a temp file
+DEFAULT_RUN_SIZE = 50_000
 
-    - Splits executions into *multiple* trades per symbol.
-      Each time the running position goes back to 0, a trade is closed.
+# How far into a file to look for the header row, some exports start
+# with a title line or account summary
+HEADER_SCAN_ROWS = 20
+
+
+def _text_stream(stream) -> TextIO:
     """
+    Accept either a text or a binary file object (e.g. UploadFile.file)
+    """
+    if isinstance(stream.read(0), bytes):
+        return io.TextIOWrapper(stream, encoding="utf-8-sig", errors="ignore", newline="")
+    return stream
 
-    reader = csv.DictReader(csv_text.splitlines())
 
-    rows: List[Dict[str, Any]] = []
+def _parse_tradezero_row(row: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Turn one TradeZero row into an execution tuple
+    (dt, symbol, side, qty, price, commissions), or None to skip it
+    """
+    symbol_raw = (row.get("Symbol") or "").strip()
+    if not symbol_raw:
+        return None
 
-    for row in reader:
-        symbol_raw = (row.get("Symbol") or "").strip()
-        if not symbol_raw:
-            continue
+    symbol = symbol_raw.upper()
+    side_raw = (row.get("Side") or "").strip().upper()
 
-        symbol = symbol_raw.upper()
-        side_raw = (row.get("Side") or "").strip().upper()
+    if side_raw not in {"B", "S"}:
+        return None
 
-        if side_raw not in {"B", "S"}:
-            continue
+    qty_raw = (row.get("Qty") or "").strip()
+    price_raw = (row.get("Price") or "").strip()
+    comm_raw = (row.get("Comm") or "").strip()
+    trade_date_raw = (row.get("T/D") or "").strip()
+    time_raw = (row.get("Exec Time") or "").strip()
 
-        qty_raw = (row.get("Qty") or "").strip()
-        price_raw = (row.get("Price") or "").strip()
-        comm_raw = (row.get("Comm") or "").strip()
-        trade_date_raw = (row.get("T/D") or "").strip()
-        time_raw = (row.get("Exec Time") or "").strip()
+    if not qty_raw or not price_raw or not trade_date_raw:
+        return None
 
-        if not qty_raw or not price_raw or not trade_date_raw:
-            continue
+    try:
+        qty = float(qty_raw)
+        price = float(price_raw)
+    except ValueError:
+        return None
+
+    try:
+        commissions = float(comm_raw) if comm_raw else 0.0
+    except ValueError:
+        commissions = 0.0
 
+    try:
+        base_date = datetime.strptime(trade_date_raw, "%m/%d/%Y").date()
+    except ValueError:
         try:
-            qty = float(qty_raw)
-            price = float(price_raw)
-        except ValueError:
-            continue
+            base_date = datetime.fromisoformat(trade_date_raw).date()
+        except Exception:
+            return None
 
+    if time_raw:
         try:
-            commissions = float(comm_raw) if comm_raw else 0.0
+            t = datetime.strptime(time_raw, "%H:%M:%S").time()
         except ValueError:
-            commissions = 0.0
+            t = datetime.min.time()
+    else:
+        t = datetime.min.time()
+
+    dt = datetime.combine(base_date, t)
+
+    side = "buy" if side_raw == "B" else "sell"
+
+    return (dt, symbol, side, qty, price, commissions)
+
 
+def _number(value: Optional[str]) -> Optional[float]:
+    """
+    Parse numbers the way exports write them: "$1,234.50", "(0.65)", "@12.3"
+    """
+    text = (value or "").strip().replace("$", "").replace(",", "").lstrip("@")
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        number = float(text.strip("()"))
+    except ValueError:
+        return None
+    return -number if negative else number
+
+
+def _parse_datetime(value: str, formats: Iterable[str]) -> Optional[datetime]:
+    for fmt in formats:
         try:
-            base_date = datetime.strptime(trade_date_raw, "%m/%d/%Y").date()
+            return datetime.strptime(value, fmt)
         except ValueError:
-            try:
-                base_date = datetime.fromisoformat(trade_date_raw).date()
-            except Exception:
-                continue
+            continue
+    return None
+
+
+def _execution(dt, symbol, side, qty, price, commissions) -> Optional[Tuple]:
+    if dt is None or not symbol or not qty or price is None:
+        return None
+    return (dt, symbol.upper(), side, abs(qty), price, abs(commissions or 0.0))
+
+
+IBKR_DATETIME_FORMATS = ("%Y%m%d;%H%M%S", "%Y-%m-%d;%H:%M:%S", "%Y-%m-%d, %H:%M:%S", "%Y%m%d %H%M%S", "%Y%m%d")
+
+
+def _parse_ibkr_row(row: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Interactive Brokers Flex Query trades. Quantity is signed and
+    commission is negative, both are made positive.
+    """
+    asset_class = (row.get("AssetClass") or "STK").strip()
+    if asset_class != "STK":
+        return None
+
+    side = {"BUY": "buy", "SELL": "sell"}.get((row.get("Buy/Sell") or "").strip().upper())
+    if side is None:
+        return None
+
+    when = (row.get("DateTime") or row.get("Date/Time") or row.get("TradeDate") or "").strip()
+    return _execution(
+        _parse_datetime(when, IBKR_DATETIME_FORMATS),
+        (row.get("Symbol") or "").strip(),
+        side,
+        _number(row.get("Quantity")),
+        _number(row.get("TradePrice")),
+        _number(row.get("IBCommission")),
+    )
+
+
+def _parse_webull_row(row: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Webull order history. Only filled orders, "Short" is a sell.
+    """
+    if (row.get("Status") or "").strip() != "Filled":
+        return None
+
+    side = {"BUY": "buy", "SELL": "sell", "SHORT": "sell"}.get((row.get("Side") or "").strip().upper())
+    if side is None:
+        return None
+
+    # "01/02/2024 09:30:15 EST", the timezone is the account's and is dropped
+    when = " ".join((row.get("Filled Time") or "").split()[:2])
+    return _execution(
+        _parse_datetime(when, ("%m/%d/%Y %H:%M:%S",)),
+        (row.get("Symbol") or "").strip(),
+        side,
+        _number(row.get("Filled")),
+        _number(row.get("Avg Price")),
+        0.0,
+    )
+
+
+SCHWAB_ACTIONS = {"Buy": "buy", "Buy to Cover": "buy", "Sell": "sell", "Sell Short": "sell"}
+
+
+def _parse_schwab_row(row: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Charles Schwab transaction history. Dates only, no execution times.
+    """
+    side = SCHWAB_ACTIONS.get((row.get("Action") or "").strip())
+    if side is None:
+        return None
+
+    # "01/02/2024 as of 12/29/2023" is the trade date first
+    when = (row.get("Date") or "").strip().split(" ")[0]
+    return _execution(
+        _parse_datetime(when, ("%m/%d/%Y",)),
+        (row.get("Symbol") or "").strip(),
+        side,
+        _number(row.get("Quantity")),
+        _number(row.get("Price")),
+        _number(row.get("Fees & Comm")),
+    )
+
+
+def _parse_robinhood_row(row: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Robinhood account activity report. Dates only, no execution times.
+    """
+    side = {"Buy": "buy", "Sell": "sell"}.get((row.get("Trans Code") or "").strip())
+    if side is None:
+        return None
+
+    return _execution(
+        _parse_datetime((row.get("Activity Date") or "").strip(), ("%m/%d/%Y",)),
+        (row.get("Instrument") or "").strip(),
+        side,
+        _number(row.get("Quantity")),
+        _number(row.get("Price")),
+        0.0,
+    )
+
 
-        if time_raw:
+class BrokerFormat(NamedTuple):
+    name: str
+    # Header cells that identify the export
+    columns: FrozenSet[str]
+    parse_row: Callable[[Dict[str, Any]], Optional[Tuple]]
+    # Newest rows at the top, same-time executions are replayed bottom up
+    newest_first: bool = False
+
+
+# Checked in order, the first whose columns are all in the header wins
+BROKER_FORMATS: List[BrokerFormat] = [
+    BrokerFormat("tradezero", frozenset({"T/D", "Side", "Symbol", "Qty", "Price"}), _parse_tradezero_row),
+    BrokerFormat("ibkr", frozenset({"Symbol", "Buy/Sell", "Quantity", "TradePrice"}), _parse_ibkr_row),
+    BrokerFormat("webull", frozenset({"Symbol", "Side", "Status", "Filled", "Avg Price", "Filled Time"}), _parse_webull_row, True),
+    BrokerFormat("schwab", frozenset({"Date", "Action", "Symbol", "Quantity", "Price", "Fees & Comm"}), _parse_schwab_row, True),
+    BrokerFormat("robinhood", frozenset({"Activity Date", "Instrument", "Trans Code", "Quantity", "Price"}), _parse_robinhood_row, True),
+]
+BROKERS: Dict[str, BrokerFormat] = {fmt.name: fmt for fmt in BROKER_FORMATS}
+
+
+def detect_broker_format(header: Iterable[str]) -> Optional[BrokerFormat]:
+    """
+    The registered format a header row belongs to, or None
+    """
+    cells = {cell.strip() for cell in header}
+    for fmt in BROKER_FORMATS:
+        if fmt.columns <= cells:
+            return fmt
+    return None
+
+
+def _find_header(reader, fmt: Optional[BrokerFormat]) -> Tuple[Optional[BrokerFormat], Optional[List[str]]]:
+    """
+    Read rows until one is a header of fmt (or of any format when fmt is
+    None). Returns the format and the header, or (None, None).
+    """
+    for _ in range(HEADER_SCAN_ROWS):
+        row = next(reader, None)
+        if row is None:
+            break
+        header = [cell.strip() for cell in row]
+        found = detect_broker_format(header) if fmt is None else (fmt if fmt.columns <= set(header) else None)
+        if found is not None:
+            return found, header
+    return None, None
+
+
+def sniff_broker_format(stream) -> Optional[BrokerFormat]:
+    """
+    Detect the format of a seekable upload from its first rows, then
+    rewind it for the real parse
+    """
+    text = _text_stream(stream)
+    try:
+        fmt, _ = _find_header(csv.reader(text), None)
+    except csv.Error:
+        fmt = None
+    finally:
+        if text is not stream:
+            text.detach()
+        stream.seek(0)
+    return fmt
+
+
+def _spill_run(run: List[Tuple]):
+    run.sort()
+    f = tempfile.TemporaryFile()
+    for item in run:
+        pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+
+def _read_run(f) -> Iterator[Tuple]:
+    try:
+        while True:
             try:
-                t = datetime.strptime(time_raw, "%H:%M:%S").time()
-            except ValueError:
-                t = datetime.min.time()
-        else:
-            t = datetime.min.time()
+                yield pickle.load(f)
+            except EOFError:
+                return
+    finally:
+        f.close()
+
+
+def _sorted_executions(executions: Iterable[Tuple], run_size: int, reverse_ties: bool = False) -> Iterator[Tuple]:
+    """
+    Sort executions by time, keeping file order for ties (or reversed
+    file order, for exports that list the newest rows first).
+
+    Up to run_size rows are sorted in memory. Larger statements are
+    spilled to temp files in sorted runs and merged back lazily, so
+    memory stays bounded however out of order the rows are.
+    """
+    run: List[Tuple] = []
+    spilled = []
+
+    for seq, (dt, *rest) in enumerate(executions):
+        run.append((dt, -seq if reverse_ties else seq, *rest))
+        if len(run) >= run_size:
+            spilled.append(_spill_run(run))
+            run = []
+
+    run.sort()
+    if not spilled:
+        yield from run
+        return
+
+    yield from heapq.merge(*(_read_run(f) for f in spilled), iter(run))
 
-        dt = datetime.combine(base_date, t)
 
-        side = "buy" if side_raw == "B" else "sell"
+def _build_trade(symbol: str, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "ticker": symbol,
+        "mistake": "",
+        "notes": "",
+        "transactions": transactions,
+    }
 
-        rows.append(
+
+def group_executions_into_trades(executions: Iterable[Tuple]) -> Iterator[Dict[str, Any]]:
+    """
+    Walk time-ordered (dt, seq, symbol, side, qty, price, commissions)
+    executions and yield a trade each time a symbol's running position
+    goes back to 0. Positions still open at the end are yielded last.
+    """
+    positions: Dict[str, float] = {}
+    open_txs: Dict[str, List[Dict[str, Any]]] = {}
+
+    for dt, _seq, symbol, side, qty, price, commissions in executions:
+        if side == "buy":
+            position = positions.get(symbol, 0.0) + qty
+        else:
+            position = positions.get(symbol, 0.0) - qty
+
+        current_txs = open_txs.setdefault(symbol, [])
+        current_txs.append(
             {
-                "symbol": symbol,
-                "side": side,
-                "qty": qty,
+                "type": side,
+                "date": dt.isoformat(timespec="seconds"),
+                "amount": qty,
                 "price": price,
                 "commissions": commissions,
-                "dt": dt,
             }
         )
 
-    # Sort rows by symbold and date time
-    rows.sort(key=lambda r: (r["symbol"], r["dt"]))
-
-    trades: List[Dict[str, Any]] = []
-
-    for symbol, group in groupby(rows, key=lambda r: r["symbol"]):
-        position = 0.0
-        current_txs: List[Dict[str, Any]] = []
-
-        for r in group:
-            qty = r["qty"]
-            if r["side"] == "buy":
-                position += qty
-            else:
-                position -= qty
-
-            current_txs.append(
-                {
-                    "type": r["side"],
-                    "date": r["dt"].isoformat(timespec="seconds"),
-                    "amount": qty,
-                    "price": r["price"],
-                    "commissions": r["commissions"],
-                }
-            )
-
-            # If position is flat, close the trade
-            if abs(position) < 1e-8:
-                trades.append(
-                    {
-                        "ticker": symbol,
-                        "mistake": "",
-                        "notes": "",
-                        "transactions": current_txs,
-                    }
-                )
-                current_txs = []
-
-        if current_txs:
-            trades.append(
-                {
-                    "ticker": symbol,
-                    "mistake": "",
-                    "notes": "",
-                    "transactions": current_txs,
-                }
-            )
-
-    return trades
+        # If position is flat, close the trade
+        if abs(position) < 1e-8:
+            yield _build_trade(symbol, current_txs)
+            del open_txs[symbol]
+            positions[symbol] = 0.0
+        else:
+            positions[symbol] = position
+
+    for symbol in sorted(open_txs):
+        yield _build_trade(symbol, open_txs[symbol])
+
+
+def iter_broker_csv(
+    stream, fmt: Optional[BrokerFormat] = None, run_size: int = DEFAULT_RUN_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a broker CSV export from a text or binary file object,
+    yielding trades in the order they close. The format is detected from
+    the header when not given. Raises ValueError if no header is found.
+    """
+    text = _text_stream(stream)
+    try:
+        reader = csv.reader(text)
+        fmt, header = _find_header(reader, fmt)
+        if fmt is None:
+            raise ValueError("No supported broker header found in CSV")
+
+        rows = csv.DictReader(text, fieldnames=header)
+        executions = filter(None, (fmt.parse_row(row) for row in rows))
+        yield from group_executions_into_trades(_sorted_executions(executions, run_size, fmt.newest_first))
+    finally:
+        if text is not stream:
+            text.detach()
+
+
+def iter_tradezero_csv(stream, run_size: int = DEFAULT_RUN_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a TradeZero 'Trade History' CSV export, see iter_broker_csv
+    """
+    return iter_broker_csv(stream, BROKERS["tradezero"], run_size)
+
+
+def parse_tradezero_csv(csv_text: str) -> List[Dict[str, Any]]:
+    """
+    Parse a TradeZero 'Trade History' CSV export into the unified trade
+    structure used by the app.
+
+    - Splits executions into *multiple* trades per symbol.
+      Each time the running position goes back to 0, a trade is closed.
+    """
+    trades = iter_tradezero_csv(io.StringIO(csv_text, newline=""))
+
+    # Grouped by symbol, each symbol's trades stay in time order
+    return sorted(trades, key=lambda t: t["ticker"])
@@ -1,14 +1,26 @@
 import os
-import requests
-from fastapi import APIRouter, HTTPException
+from collections import defaultdict
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
 from dotenv import load_dotenv
-import time
+
+from ..cache import TTLCache
+from ..database.models import get_db
+from ..market_data import get_candles, get_candles_for_symbol, parse_window, upstream_fetches
+from ..utils import get_current_user
 
 load_dotenv()
 router = APIRouter()
-_CACHE = {}
 
-TTL_SECONDS = 60 * 10
+TTL_SECONDS = int(os.getenv("MARKET_DATA_CACHE_TTL", 60 * 10))
+CACHE_SIZE = int(os.getenv("MARKET_DATA_CACHE_SIZE", 1024))
+MAX_BATCH_WINDOWS = 500
+# Each symbol can cost an Alpha Vantage call, the quota is shared by everyone
+MAX_BATCH_SYMBOLS = 20
+
+_CACHE = TTLCache(maxsize=CACHE_SIZE, ttl=TTL_SECONDS)
 
 API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 if not API_KEY:
@@ -16,95 +28,86 @@ if not API_KEY:
 
 
 @router.get("/stock-data")
-def get_stock_data(symbol: str, start_date: str, end_date: str):
+async def get_stock_data(symbol: str, start_date: str, end_date: str, db: Session = Depends(get_db)):
     """
     Return OHLC candles with padding around the trade window:
-    - 20 bars before the first trade date
+    - 100 bars before the first trade date
     - 20 bars after the last trade date (or as many as available)
-    Using Alpha Vantage TIME_SERIES_DAILY (compact).
+    Bars come from the local daily_bars store, which is topped up from
+    Alpha Vantage TIME_SERIES_DAILY at most once a day per symbol.
+    Over the API quota, stored bars are served as they are.
     """
     key = (symbol.upper(), start_date[:10], end_date[:10])
-    now = time.time()
-
-    cached = _CACHE.get(key)
-    if cached and cached[0] > now:
-        return cached[1]
-    api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="ALPHA_VANTAGE_API_KEY not set")
-
-    url = "https://www.alphavantage.co/query"
-    params = {
-        "function": "TIME_SERIES_DAILY",
-        "symbol": symbol,
-        "outputsize": "compact",
-        "apikey": api_key,
-    }
-
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        raise HTTPException(status_code=502, detail=f"Alpha Vantage request failed: {e}")
-
-    data = response.json()
-    print("AlphaVantage raw response:", data)
-
-    time_series = data.get("Time Series (Daily)")
-    if not time_series:
-        raise HTTPException(
-            status_code=502,
-            detail=data.get("Note") or data.get("Error Message") or "Unexpected Alpha Vantage response.",
-        )
-
-    # Normalise incoming dates to YYYY-MM-DD
-    start = start_date[:10]
-    end = end_date[:10]
-
-    all_dates = sorted(time_series.keys())
-
-    if not all_dates:
-        return []
-
-    # Find index of first candle on/after trade start
-    first_idx = None
-    for i, d in enumerate(all_dates):
-        if d >= start:
-            first_idx = i
-            break
-
-    # Find index of last candle on/before trade end
-    last_idx = None
-    for i in range(len(all_dates) - 1, -1, -1):
-        d = all_dates[i]
-        if d <= end:
-            last_idx = i
-            break
-
-    # If we cant find the trade window, return empty
-    if first_idx is None or last_idx is None:
-        return []
-
-    PADDING_BEFORE = 100
-    PADDING_AFTER = 20
-
-    from_idx = max(0, first_idx - PADDING_BEFORE)
-    to_idx = min(len(all_dates) - 1, last_idx + PADDING_AFTER)
-
-    candles = []
-    for d in all_dates[from_idx : to_idx + 1]:
-        bar = time_series[d]
-        candles.append(
-            {
-                "time": d,
-                "open": float(bar["1. open"]),
-                "high": float(bar["2. high"]),
-                "low": float(bar["3. low"]),
-                "close": float(bar["4. close"]),
-            }
-        )
-    
-    _CACHE[key] = (now + TTL_SECONDS, candles)
-
-    return candles
 
+    return await _CACHE.get_or_load(key, lambda: get_candles(db, symbol, start_date, end_date))
+
+
+class CandleWindow(BaseModel):
+    symbol: str
+    start_date: str
+    end_date: str
+
+class CandleBatchRequest(BaseModel):
+    windows: List[CandleWindow]
+
+
+@router.post("/stock-data/batch")
+async def get_stock_data_batch(
+    request: CandleBatchRequest,
+    db: Session = Depends(get_db),
+    user_details: dict = Depends(get_current_user),
+):
+    """
+    Candles for many trade windows in one round trip. Windows are grouped
+    by symbol so each symbol is refreshed and loaded once, and a batch
+    can name at most MAX_BATCH_SYMBOLS symbols. Results come back in
+    request order, each with either "candles" or an "error".
+    """
+    if len(request.windows) > MAX_BATCH_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_WINDOWS} windows per batch")
+    if len({w.symbol.upper() for w in request.windows}) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SYMBOLS} symbols per batch")
+
+    results = []
+    by_symbol = defaultdict(list)
+
+    for i, w in enumerate(request.windows):
+        result = {"symbol": w.symbol.upper(), "start_date": w.start_date, "end_date": w.end_date}
+        results.append(result)
+
+        try:
+            start, end = parse_window(w.start_date, w.end_date)
+        except HTTPException as e:
+            result["error"] = e.detail
+            continue
+
+        key = (result["symbol"], start, end)
+        cached = _CACHE.get(key)
+        if cached is not None:
+            result["candles"] = cached
+            continue
+
+        by_symbol[result["symbol"]].append((i, key))
+
+    # One symbol at a time, the request's session isn't safe to share
+    for symbol, items in by_symbol.items():
+        windows = [(start, end) for _i, (_symbol, start, end) in items]
+        try:
+            candle_sets = await get_candles_for_symbol(db, symbol, windows)
+        except HTTPException as e:
+            for i, _key in items:
+                results[i]["error"] = e.detail
+            continue
+
+        for (i, key), candles in zip(items, candle_sets):
+            _CACHE.set(key, candles)
+            results[i]["candles"] = candles
+
+    return {"results": results}
+
+
+@router.get("/cache-stats")
+def get_cache_stats():
+    stats = _CACHE.stats()
+    stats["upstream_coalesced"] = upstream_fetches.coalesced
+    return stats
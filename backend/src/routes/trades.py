@@ -1,28 +1,41 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import List, Literal
+from typing import List, Literal, Optional
 from io import StringIO
-from collections import defaultdict
+from itertools import groupby
 import csv
+import logging
 
-from ..ai_generator import parse_trades_from_csv_with_ai
-from ..parse_broker_statement import parse_tradezero_csv
+from ..analytics import load_trade_stats, compute_stats, build_equity_curve
+from ..parse_broker_statement import BROKERS
+from .. import import_jobs
 
 from ..database.db import (
-    get_trades_by_user,
+    get_trades_page,
+    TRADE_PAGE_SIZE,
+    MAX_TRADE_PAGE_SIZE,
     create_trade,
     update_trade,
-    upsert_trade_from_import,
+    get_max_sell_count,
+    iter_export_rows,
+    get_daily_pnl,
+    get_mistake_breakdown,
+    rollup_contribution,
+    apply_rollup_changes,
+    stored_fills,
 )
-from ..utils import authenticate_and_get_user_details
-from ..database.models import get_db
+from ..database.normalise import normalise_ticker
+from ..utils import get_current_user
+from ..database.models import get_db, SessionLocal, run_db, run_bulk_db
 from ..database import models
 import json
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 router = APIRouter()
+log = logging.getLogger(__name__)
 
 class TradeTransactionIn(BaseModel):
     type: Literal["buy", "sell"]
@@ -43,11 +56,11 @@ class TradeNotesUpdate(BaseModel):
 
 
 @router.post("/trades")
-async def add_trade(request: TradeCreateRequest, request_obj: Request, db:Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request_obj)
+async def add_trade(request: TradeCreateRequest, db:Session = Depends(get_db), user_details: dict = Depends(get_current_user)):
     user_id = user_details.get("user_id")
 
-    trade = create_trade(
+    trade = await run_db(
+        create_trade,
         db=db,
         user_id = user_id,
         ticker=request.ticker,
@@ -59,11 +72,11 @@ async def add_trade(request: TradeCreateRequest, request_obj: Request, db:Sessio
     return {"status": "success", "trade_id":trade.id}
 
 @router.put("/trades/{trade_id}")
-async def edit_trade(trade_id: int ,request: TradeCreateRequest, request_obj: Request, db:Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request_obj)
+async def edit_trade(trade_id: int ,request: TradeCreateRequest, db:Session = Depends(get_db), user_details: dict = Depends(get_current_user)):
     user_id = user_details.get("user_id")
 
-    updated = update_trade(
+    updated = await run_db(
+        update_trade,
         db=db,
         trade_id=trade_id,
         user_id = user_id,
@@ -78,30 +91,19 @@ async def edit_trade(trade_id: int ,request: TradeCreateRequest, request_obj: Re
     return {"status": "updated", "trade_id":updated.id}
 
 def summarise_trade(trade: models.Trade):
-    buys = [tx for tx in trade.transactions if tx.type == "buy"]
-    sells = [tx for tx in trade.transactions if tx.type == "sell"]
+    return {"status": trade.status, "pnl": trade.realized_pnl}
 
-    total_bought = sum(tx.amount for tx in buys)
-    total_sold = sum(tx.amount for tx in sells)
 
-    net_shares = total_bought - total_sold
-
-    if net_shares == 0:
-        buy_total = sum(tx.amount * tx.price for tx in buys)
-        sell_total = sum(tx.amount * tx.price for tx in sells)
-        total_commissions = sum(tx.commissions for tx in trade.transactions)
-        pnl = sell_total - buy_total - total_commissions
-        return {"status": "Closed", "pnl": pnl}
-    else:
-        return {"status": "Open", "pnl": None}
-
-
-@router.get("/trades")
-async def get_trades(request: Request, db:Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request)
-    user_id = user_details.get("user_id")
+def _parse_day(value: Optional[str], name: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.combine(date.fromisoformat(value[:10]), datetime.min.time())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD")
 
-    trades = get_trades_by_user(db, user_id)
+def _list_trades(db: Session, user_id: str, limit: int, cursor: Optional[str], filters: dict):
+    trades, next_cursor = get_trades_page(db, user_id, limit=limit, cursor=cursor, **filters)
 
     summarised = []
     for trade in trades:
@@ -118,156 +120,134 @@ async def get_trades(request: Request, db:Session = Depends(get_db)):
             "pnl": summary["pnl"]
         })
 
-    return {"trades": summarised}
+    return {"trades": summarised, "next_cursor": next_cursor}
 
-@router.delete("/trades/{trade_id}")
-async def delete_trade(trade_id: int, request: Request, db:Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request)
+@router.get("/trades")
+async def get_trades(
+    limit: int = Query(TRADE_PAGE_SIZE, ge=1, le=MAX_TRADE_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    ticker: Optional[str] = None,
+    status: Optional[Literal["Open", "Closed"]] = None,
+    trade_type: Optional[Literal["Long", "Short"]] = None,
+    mistake: Optional[str] = None,
+    start_date: Optional[str] = Query(None, description="Last transaction on or after, YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Last transaction on or before, YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+    user_details: dict = Depends(get_current_user),
+):
     user_id = user_details.get("user_id")
 
+    end = _parse_day(end_date, "end_date")
+    filters = {
+        "ticker": normalise_ticker(ticker) if ticker else None,
+        "status": status,
+        "trade_type": trade_type,
+        "mistake": mistake,
+        "start": _parse_day(start_date, "start_date"),
+        "end": end + timedelta(days=1) if end else None,
+    }
+
+    return await run_db(_list_trades, db, user_id, limit, cursor, filters)
+
+def _delete_trade(db: Session, user_id: str, trade_id: int):
     trade = db.query(models.Trade).filter(models.Trade.id == trade_id, models.Trade.user_id == user_id).first()
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     
     try:
+        apply_rollup_changes(db, user_id, removed=[rollup_contribution(trade, stored_fills(db, trade.id))])
         db.delete(trade)
         db.commit()
-    except Exception as e:
+    except Exception:
         db.rollback()
-        print("DELETE FAILED:", e)
+        log.exception("Deleting trade failed", extra={"user_id": user_id, "trade_id": trade_id})
         raise HTTPException(status_code=500, detail="Deletion failed")
     return {"message": "Trade deleted"}
 
-@router.delete("/trades")
-async def delete_all_trades(request: Request, db: Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request)
+@router.delete("/trades/{trade_id}")
+async def delete_trade(trade_id: int, db:Session = Depends(get_db), user_details: dict = Depends(get_current_user)):
     user_id = user_details.get("user_id")
 
+    return await run_db(_delete_trade, db, user_id, trade_id)
+
+def _delete_all_trades(db: Session, user_id: str):
     try:
         q = db.query(models.Trade).filter(models.Trade.user_id == user_id)
         deleted_count = q.count()
         q.delete(synchronize_session=False)
+        db.query(models.DailyPnl).filter(models.DailyPnl.user_id == user_id).delete(synchronize_session=False)
         db.commit()
         return {"deleted": deleted_count}
-    except Exception as e:
+    except Exception:
         db.rollback()
-        print("DELETE ALL FAILED:", e)
+        log.exception("Deleting all trades failed", extra={"user_id": user_id})
         raise HTTPException(status_code=500, detail="Failed to delete all trades")
 
+@router.delete("/trades")
+async def delete_all_trades(db: Session = Depends(get_db), user_details: dict = Depends(get_current_user)):
+    user_id = user_details.get("user_id")
 
-@router.post("/trades/import-csv")
+    return await run_bulk_db(_delete_all_trades, db, user_id)
+
+
+@router.post("/trades/import-csv", status_code=202)
 async def import_trades_from_csv(
-    request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
+    user_details: dict = Depends(get_current_user),
 ):
     """
-    Upload a CSV of executions, let AI turn it into trades,
-    then insert those trades into the database for the current user.
+    Upload a CSV of executions and queue an import job for the current
+    user. Exports from a supported broker are parsed directly, anything
+    else is turned into trades by AI. Poll /import-jobs/{job_id}.
     """
-    user_details = authenticate_and_get_user_details(request)
     user_id = user_details.get("user_id")
+    return await _queue_import(db, user_id, file, None)
 
-    # Read the uploaded file into text
-    content_bytes = await file.read()
-    csv_text = content_bytes.decode("utf-8", errors="ignore")
-
-    try:
-        ai_trades = parse_trades_from_csv_with_ai(csv_text)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI parsing failed: {e}")
-
-    inserted = 0
-    created_trade_ids = []
-
-    for t in ai_trades:
-        try:
-            ticker = t["ticker"]
-            mistake = t.get("mistake", "None")
-            notes = t.get("notes", "")
-            transactions = t["transactions"]
-
-            normalized_txs = []
-            for tx in transactions:
-                normalized_txs.append(
-                    {
-                        "type": tx["type"],
-                        "date": tx["date"],
-                        "amount": float(tx["amount"]),
-                        "price": float(tx["price"]),
-                        "commissions": float(tx.get("commissions", 0.0)),
-                    }
-                )
-
-            trade = create_trade(
-                db=db,
-                user_id=user_id,
-                ticker=ticker,
-                mistake=mistake,
-                notes=notes,
-                transactions=normalized_txs,
-            )
-
-            inserted += 1
-            created_trade_ids.append(trade.id)
-        except Exception as e:
-            print("Error inserting trade from AI:", e)
-            continue
-
-    return {
-        "status": "success",
-        "inserted": inserted,
-        "trade_ids": created_trade_ids,
-    }
-
-@router.post("/trades/import-broker-csv")
+@router.post("/trades/import-broker-csv", status_code=202)
 async def import_broker_csv(
-    request: Request,
-    broker: str = Query(..., description="Broker name, e.g. 'tradezero'"),
+    broker: Optional[str] = Query(None, description="Broker name, e.g. 'tradezero'. Detected from the header when left out"),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
+    user_details: dict = Depends(get_current_user),
 ):
-    user_details = authenticate_and_get_user_details(request)
     user_id = user_details.get("user_id")
 
-    content = await file.read()
-    try:
-      text = content.decode("utf-8", errors="ignore")
-    except Exception:
-      raise HTTPException(status_code=400, detail="Could not read CSV file")
-
-    if broker.lower() == "tradezero":
-        trades = parse_tradezero_csv(text)
-    else:
+    if broker and broker.lower() not in BROKERS:
         raise HTTPException(status_code=400, detail=f"Unsupported broker: {broker}")
 
-    if not trades:
-        raise HTTPException(status_code=400, detail="No trades parsed from CSV")
+    return await _queue_import(db, user_id, file, broker.lower() if broker else None)
+
+async def _queue_import(db: Session, user_id: str, file: UploadFile, broker: Optional[str]):
+    job_id = await run_in_threadpool(import_jobs.save_upload, file.file)
+    job = await run_db(import_jobs.create_job, db, job_id, user_id, file.filename, broker)
+    import_jobs.submit(job_id)
+    return import_jobs.job_summary(job)
 
-    created_ids = []
-    for t in trades:
-        trade = upsert_trade_from_import(
-            db=db,
-            user_id=user_id,
-            ticker=t["ticker"],
-            mistake=t.get("mistake", "Imported from broker CSV"),
-            notes=t.get("notes", ""),
-            transactions=t["transactions"],
-        )
-        created_ids.append(trade.id)
+def _get_import_job(db: Session, user_id: str, job_id: str):
+    job = db.get(models.ImportJob, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_jobs.job_summary(job)
 
-    return {"created_trade_ids": created_ids, "count": len(created_ids)}
+@router.get("/import-jobs/{job_id}")
+async def get_import_job(job_id: str, db: Session = Depends(get_db), user_details: dict = Depends(get_current_user)):
+    user_id = user_details.get("user_id")
+
+    return await run_db(_get_import_job, db, user_id, job_id)
 
 @router.patch("/trades/{trade_id}/notes")
 async def update_trade_notes(
     trade_id: int,
     request_data: TradeNotesUpdate,
-    request: Request,
     db: Session = Depends(get_db),
+    user_details: dict = Depends(get_current_user),
 ):
-    user_details = authenticate_and_get_user_details(request)
     user_id = user_details.get("user_id")
 
+    return await run_db(_update_trade_notes, db, user_id, trade_id, request_data)
+
+def _update_trade_notes(db: Session, user_id: str, trade_id: int, request_data: TradeNotesUpdate):
     trade = (
         db.query(models.Trade)
         .filter(models.Trade.id == trade_id, models.Trade.user_id == user_id)
@@ -276,8 +256,11 @@ async def update_trade_notes(
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
 
+    fills = stored_fills(db, trade.id)
+    previous = rollup_contribution(trade, fills)
     trade.mistake = request_data.mistake
     trade.notes = request_data.notes
+    apply_rollup_changes(db, user_id, removed=[previous], added=[rollup_contribution(trade, fills)])
 
     db.add(trade)
     db.commit()
@@ -290,11 +273,79 @@ async def update_trade_notes(
         "notes": trade.notes,
     }
 
+def _export_row(ticker: str, side: str, txs: list, max_sells: int) -> list:
+    buys = [t for t in txs if t.type == "buy"]
+    sells = [t for t in txs if t.type == "sell"]
+
+    buy_date_str = ""
+    buy_price_str = ""
+    if buys:
+        total_shares = sum(b.amount for b in buys)
+        if total_shares > 0:
+            avg_buy_price = sum(b.amount * b.price for b in buys) / total_shares
+            buy_price_str = f"{avg_buy_price:.4f}"
+        first_buy_date = buys[0].date
+        buy_date_str = first_buy_date.strftime("%Y-%m-%d %H:%M:%S")
+
+    sell_cells: List[str] = []
+    for s in sells:
+        sell_cells.append(s.date.strftime("%Y-%m-%d %H:%M:%S"))
+        sell_cells.append(f"{s.price:.4f}")
+
+    while len(sell_cells) < max_sells * 2:
+        sell_cells.append("")
+        sell_cells.append("")
+
+    if buys and sells and sum(b.amount for b in buys) == sum(s.amount for s in sells):
+        buy_total = sum(b.amount * b.price for b in buys)
+        sell_total = sum(s.amount * s.price for s in sells)
+        total_commissions = sum(tx.commissions for tx in txs)
+        pnl = sell_total - buy_total - total_commissions
+    else:
+        pnl = 0.0
+
+    return [
+        ticker,
+        side,
+        buy_date_str,
+        buy_price_str,
+        *sell_cells,
+        f"{pnl:.2f}",
+    ]
+
+def _stream_export_csv(user_id: str, header: list, max_sells: int, rows_per_chunk: int = 200):
+    """
+    Yield the CSV in chunks of rows as trades are read from the cursor.
+    Uses its own session since the request's one is closed before
+    the response body is streamed.
+    """
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+
+    db = SessionLocal()
+    try:
+        rows = iter_export_rows(db, user_id)
+        for i, (_trade_id, group) in enumerate(groupby(rows, key=lambda r: r.id), start=1):
+            group = list(group)
+            first = group[0]
+            txs = [r for r in group if r.type is not None]
+            writer.writerow(_export_row(first.ticker, first.trade_type or "Long", txs, max_sells))
+
+            if i % rows_per_chunk == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+    finally:
+        db.close()
+
+    yield output.getvalue()
+
 @router.get("/trades/export-csv")
 async def export_trades_csv(
-    request: Request,
     db: Session = Depends(get_db),
-) -> Response:
+    user_details: dict = Depends(get_current_user),
+) -> StreamingResponse:
     """
     Export all trades for the current user as a CSV file.
 
@@ -304,88 +355,25 @@ async def export_trades_csv(
 
     N is the maximum number of sells on any trade.
     """
-    user_details = authenticate_and_get_user_details(request)
     user_id = user_details.get("user_id")
 
-    trades: List[models.Trade] = get_trades_by_user(db, user_id)
-
-    output = StringIO()
-    writer = csv.writer(output)
-
-    max_sells = 0
-    trade_data = []
-
-    for trade in trades:
-        txs = sorted(trade.transactions, key=lambda t: t.date)
-        buys = [t for t in txs if t.type == "buy"]
-        sells = [t for t in txs if t.type == "sell"]
-        max_sells = max(max_sells, len(sells))
-
-        trade_data.append((trade, txs, buys, sells))
+    max_sells = await run_db(get_max_sell_count, db, user_id)
 
     header = ["Trade", "Side", "Buy Date", "Buy Price"]
     for i in range(1, max_sells + 1):
         header.append(f"Sell Date {i}")
         header.append(f"Sell Price {i}")
     header.append("Profit/Loss")
-    writer.writerow(header)
 
-    for trade, txs, buys, sells in trade_data:
-        side = trade.trade_type or "Long"
-
-        buy_date_str = ""
-        buy_price_str = ""
-        if buys:
-            total_shares = sum(b.amount for b in buys)
-            if total_shares > 0:
-                avg_buy_price = sum(b.amount * b.price for b in buys) / total_shares
-                buy_price_str = f"{avg_buy_price:.4f}"
-            first_buy_date = buys[0].date
-            buy_date_str = first_buy_date.strftime("%Y-%m-%d %H:%M:%S")
-
-        sell_cells: List[str] = []
-        for s in sells:
-            sell_cells.append(s.date.strftime("%Y-%m-%d %H:%M:%S"))
-            sell_cells.append(f"{s.price:.4f}")
-
-        while len(sell_cells) < max_sells * 2:
-            sell_cells.append("")
-            sell_cells.append("")
-
-        if buys and sells and sum(b.amount for b in buys) == sum(s.amount for s in sells):
-            buy_total = sum(b.amount * b.price for b in buys)
-            sell_total = sum(s.amount * s.price for s in sells)
-            total_commissions = sum(tx.commissions for tx in txs)
-            pnl = sell_total - buy_total - total_commissions
-        else:
-            pnl = 0.0
-
-        row = [
-            trade.ticker,
-            side,
-            buy_date_str,
-            buy_price_str,
-            *sell_cells,
-            f"{pnl:.2f}",
-        ]
-        writer.writerow(row)
-
-    csv_data = output.getvalue()
-    output.close()
-
-    return Response(
-        content=csv_data,
+    return StreamingResponse(
+        _stream_export_csv(user_id, header, max_sells),
         media_type="text/csv",
         headers={
             "Content-Disposition": 'attachment; filename="trades_export.csv"'
         },
     )
 
-@router.get("/trades/{trade_id}")
-async def get_trade(trade_id: int, request: Request, db:Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request)
-    user_id = user_details.get("user_id")
-
+def _get_trade(db: Session, user_id: str, trade_id: int):
     trade = db.query(models.Trade).filter_by(id=trade_id, user_id=user_id).first()
 
     if not trade:
@@ -417,114 +405,46 @@ async def get_trade(trade_id: int, request: Request, db:Session = Depends(get_db
         }
     }
 
-def _trade_is_closed(trade: models.Trade):
-    buys = [tx for tx in trade.transactions if tx.type == "buy"]
-    sells = [tx for tx in trade.transactions if tx.type == "sell"]
-    return abs(sum(b.amount for b in buys) - sum(s.amount for s in sells)) < 1e-9
-
-def _trade_pnl_and_base(trade: models.Trade):
-    txs = sorted(trade.transactions, key=lambda t: t.date)
-    buys = [tx for tx in txs if tx.type == "buy"]
-    sells = [tx for tx in txs if tx.type == "sell"]
-
-    buy_total = sum(tx.amount * tx.price for tx in buys)
-    sell_total = sum(tx.amount * tx.price for tx in sells)
-    commissions = sum(tx.commissions for tx in txs)
-
-    pnl = sell_total - buy_total - commissions
-
-    if (trade.trade_type or "Long").lower() == "short":
-        base = sell_total
-    else:
-        base = buy_total
-    
-    return pnl, base
-
-@router.get("/dashboard")
-async def get_dashboard(request: Request, db: Session = Depends(get_db)):
-    user_details = authenticate_and_get_user_details(request)
+@router.get("/trades/{trade_id}")
+async def get_trade(trade_id: int, db:Session = Depends(get_db), user_details: dict = Depends(get_current_user)):
     user_id = user_details.get("user_id")
 
-    trades = get_trades_by_user(db, user_id)
-
-    closed = [t for t in trades if _trade_is_closed(t)]
+    return await run_db(_get_trade, db, user_id, trade_id)
 
-    pnl_by_day = defaultdict(float)
-    for t in closed:
-        close_dt = t.latest_transaction or t.earliest_transaction
-        if not close_dt:
-            continue
-        day = close_dt.date().isoformat()
+def _build_dashboard(db: Session, user_id: str, filters: dict = None):
+    """
+    Equity curve, stats and mistake breakdown, each aggregated by sqlite
+    over an index range of the rollup or the trades. filters are
+    start/end (end exclusive) and ticker, all optional.
+    """
+    filters = filters or {}
+    equity_curve = build_equity_curve(get_daily_pnl(db, user_id, **filters))
 
-        pnl, _base = _trade_pnl_and_base(t)
-        pnl_by_day[day] += float(pnl)
-    
-    days_sorted = sorted(pnl_by_day.keys())
-    equity_curve = []
-    running = 0.0
+    stats = compute_stats(load_trade_stats(db, user_id, **filters))
 
-    for d in days_sorted:
-        running += pnl_by_day[d]
-        equity_curve.append({"time":d, "value": round(running, 2)})
-    
-    pnls = []
-    rets = []
-    for t in closed:
-        pnl, base = _trade_pnl_and_base(t)
-        pnl = float(pnl)
-        pnls.append(pnl)
-
-        if base and abs(base) > 1e-12:
-            rets.append((pnl/ float(base)) * 100.0)
-        else:
-            rets.append(0.0)
-        
-    wins = [p for p in pnls if p > 0]
-    losses = [p for p in pnls if p < 0]
-    win_rets = [r for (p,r) in zip(pnls, rets) if p > 0]
-    loss_rets = [r for (p, r) in zip(pnls,rets) if p < 0]
-
-    total_pnl = sum(pnls)
-    avg_win = (sum(wins) / len(wins)) if wins else 0.0
-    avg_loss = (sum(losses) / len(losses)) if losses else 0.0
-    max_win = max(pnls) if pnls else 0.0
-    max_loss = min(pnls) if pnls else 0.0
-    win_pct = (len(wins) / len(pnls) * 100.0) if pnls else 0.0
-
-    sum_wins = sum(wins)
-    sum_losses_abs = abs(sum(losses))
-    profit_factor = (sum_wins / sum_losses_abs) if sum_losses_abs > 1e-12 else (None if sum_wins == 0 else "∞")
-
-    avg_gain_pct = sum(win_rets) / len(win_rets) if win_rets else 0.0
-    avg_loss_pct = sum(loss_rets) / len(loss_rets) if loss_rets else 0.0
-    max_gain_pct = max(rets) if rets else 0.0
-    max_loss_pct = min(rets) if rets else 0.0
-
-    stats = {
-        "total_pnl": round(total_pnl, 2),
-        "avg_loss": round(avg_loss, 2),
-        "avg_win": round(avg_win, 2),
-        "max_loss": round(max_loss, 2),
-        "max_win": round(max_win, 2),
-        "win_pct": round(win_pct, 2),
-        "profit_factor": None if profit_factor is None else (profit_factor if profit_factor == float("inf") else round(profit_factor, 2)),
-        "avg_loss_pct": round(avg_loss_pct, 2),
-        "avg_gain_pct": round(avg_gain_pct, 2),
-        "max_loss_pct": round(max_loss_pct, 2),
-        "max_gain_pct": round(max_gain_pct, 2),
-    }
-
-    mistake_map = defaultdict(lambda: {"count": 0, "pnl":0.0})
-    for t in closed:
-        m = (t.mistake or "None").strip() or "None"
-        pnl, _base = _trade_pnl_and_base(t)
-        mistake_map[m]["count"] += 1
-        mistake_map[m]["pnl"] += float(pnl)
-    
     mistakes = [
-        {"mistake": k, "count": v["count"], "pnl": round(v["pnl"], 2)}
-        for k, v in mistake_map.items()
+        {"mistake": m, "count": int(count), "pnl": round(float(pnl), 2)}
+        for m, count, pnl in get_mistake_breakdown(db, user_id, **filters)
     ]
     mistakes.sort(key=lambda x: x["count"], reverse=True)
 
     return {"equity_curve": equity_curve, "stats": stats, "mistakes": mistakes}
+
+@router.get("/dashboard")
+async def get_dashboard(
+    start_date: Optional[str] = Query(None, alias="from", description="First day to include, YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, alias="to", description="Last day to include, YYYY-MM-DD"),
+    ticker: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user_details: dict = Depends(get_current_user),
+):
+    user_id = user_details.get("user_id")
+
+    end = _parse_day(end_date, "to")
+    filters = {
+        "start": _parse_day(start_date, "from"),
+        "end": end + timedelta(days=1) if end else None,
+        "ticker": normalise_ticker(ticker) if ticker else None,
+    }
+
+    return await run_db(_build_dashboard, db, user_id, filters)
@@ -1,22 +1,44 @@
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from clerk_backend_api import Clerk, AuthenticateRequestOptions
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional
+import hashlib
 import os
+import time
+import jwt
 from dotenv import load_dotenv
 
+from .cache import TTLCache
+from .metrics import upstream_timer
+
 load_dotenv()
 
 
 clerk_sdk = Clerk(bearer_auth=os.getenv("CLERK_SECRET_KEY"))
 
+AUTHORIZED_PARTIES = ["http://localhost:5173", "http://localhost:5174"]
+
+# Same allowance for clock drift between us and Clerk as the Clerk SDK
+CLOCK_SKEW_SECONDS = 5
+
+# Verified session tokens, keyed by sha256 of the token, kept until exp
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 4096))
+_verified_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=60)
+
+_jwt_key = None
+
+
 def authenticate_and_get_user_details(request):
     try:
-        request_state = clerk_sdk.authenticate_request(
-            request,
-            AuthenticateRequestOptions(
-                authorized_parties=["http://localhost:5173", "http://localhost:5174"],
-                jwt_key=os.getenv("JWT_KEY")
+        with upstream_timer("clerk"):
+            request_state = clerk_sdk.authenticate_request(
+                request,
+                AuthenticateRequestOptions(
+                    authorized_parties=AUTHORIZED_PARTIES,
+                    jwt_key=os.getenv("JWT_KEY")
+                )
             )
-        )
 
         if not request_state.is_signed_in:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -24,5 +46,93 @@ def authenticate_and_get_user_details(request):
         user_id = request_state.payload.get("sub")
 
         return {"user_id": user_id}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _load_jwt_key():
+    """
+    Parse the JWT_KEY PEM once, None if it isn't configured
+    """
+    global _jwt_key
+    if _jwt_key is None:
+        pem = os.getenv("JWT_KEY")
+        if not pem:
+            return None
+        # .env files often hold the key on one line with literal \n
+        pem = pem.replace("\\n", "\n")
+        try:
+            _jwt_key = jwt.algorithms.RSAAlgorithm(jwt.algorithms.RSAAlgorithm.SHA256).prepare_key(pem)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"JWT_KEY is not a valid RSA public key: {e}")
+    return _jwt_key
+
+
+def get_session_token(request: Request) -> Optional[str]:
+    """
+    Session token from the Authorization header or the __session cookie
+    """
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        return authorization.removeprefix("Bearer ").strip()
+
+    cookie_header = request.headers.get("cookie")
+    if cookie_header:
+        for key, morsel in SimpleCookie(cookie_header).items():
+            if key.startswith("__session"):
+                return morsel.value
+
+    return None
+
+
+def verify_session_token(token: str, key) -> Dict[str, Any]:
+    """
+    Check the token's signature, exp, nbf and azp locally and return
+    its claims. Verified claims are cached until the token expires.
+    """
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    claims = _verified_tokens.get(cache_key)
+    now = time.time()
+    if claims is not None and claims["exp"] + CLOCK_SKEW_SECONDS > now:
+        return claims
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            options={"verify_iss": False, "verify_aud": False, "require": ["exp", "sub"]},
+            leeway=CLOCK_SKEW_SECONDS,
+        )
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+
+    # Only session tokens from a browser carry azp
+    azp = claims.get("azp")
+    if azp is not None and azp not in AUTHORIZED_PARTIES:
+        raise HTTPException(status_code=401, detail="Invalid token: unauthorized party")
+
+    ttl = claims["exp"] + CLOCK_SKEW_SECONDS - now
+    if ttl > 0:
+        _verified_tokens.set(cache_key, claims, ttl=ttl)
+    return claims
+
+
+async def get_current_user(request: Request) -> Dict[str, str]:
+    """
+    Dependency for routes that need the signed in user. Verifies the
+    session JWT against JWT_KEY without a call to Clerk, and falls back
+    to the Clerk SDK when no key is configured.
+    """
+    key = _load_jwt_key()
+    if key is None:
+        return await run_in_threadpool(authenticate_and_get_user_details, request)
+
+    token = get_session_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing session token")
+
+    claims = verify_session_token(token, key)
+    return {"user_id": claims["sub"]}
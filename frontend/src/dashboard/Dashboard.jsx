@@ -9,19 +9,26 @@ export function Dashboard() {
     const [data, setData] = useState(null)
     const [loading, setLoading] = useState(null)
     const [error, setError] = useState(null)
+    const [filters, setFilters] = useState({ from: "", to: "", ticker: "" })
 
     useEffect(() => {
         ;(async () => {
+            const params = new URLSearchParams()
+            if (filters.from) params.set("from", filters.from)
+            if (filters.to) params.set("to", filters.to)
+            if (filters.ticker) params.set("ticker", filters.ticker)
+
             try {
-                const res = await makeRequest("dashboard")
+                const res = await makeRequest(`dashboard?${params.toString()}`)
                 setData(res)
+                setError(null)
             } catch (e) {
                 setError("Failed to load dashboard.")
             } finally {
                 setLoading(false)
             }
         }) ()
-    }, [])
+    }, [filters])
 
     if (loading) return <div className="text-white/80">Loading dashboard…</div>
     if (error) return <div className="text-red-400">{error}</div>
@@ -32,10 +39,37 @@ export function Dashboard() {
             <div className="flex items-end justify-between">
                 <h2 className="text-2xl font-semibold text-pink-400">Dashboard</h2>
                 <div className="text-white/60 text-sm">
-                Closed trades only
+                Stats cover closed trades, P&amp;L includes partial exits
                 </div>
             </div>
 
+            <div className="flex gap-3">
+                <input
+                    type="date"
+                    value={filters.from}
+                    onChange={(e) => setFilters({ ...filters, from: e.target.value })}
+                    className="bg-white/10 text-white px-3 py-1 rounded-md text-sm"
+                />
+                <input
+                    type="date"
+                    value={filters.to}
+                    onChange={(e) => setFilters({ ...filters, to: e.target.value })}
+                    className="bg-white/10 text-white px-3 py-1 rounded-md text-sm"
+                />
+                <input
+                    type="text"
+                    placeholder="Ticker"
+                    defaultValue={filters.ticker}
+                    onKeyDown={(e) => {
+                        if (e.key === "Enter") setFilters({ ...filters, ticker: e.target.value.trim() })
+                    }}
+                    onBlur={(e) => {
+                        if (e.target.value.trim() !== filters.ticker) setFilters({ ...filters, ticker: e.target.value.trim() })
+                    }}
+                    className="bg-white/10 text-white px-3 py-1 rounded-md text-sm"
+                />
+            </div>
+
             <div className="bg-white rounded-2xl p-4 shadow">
                 <h3 className="text-black font-semibold mb-2">Profit &amp; Loss Over Time</h3>
                 <PnLLineChart seriesData={data.equity_curve || []} />
@@ -33,7 +33,8 @@ export function TradeDetail() {
     }, [id])
 
     const formatPnl = (pnl, status) => {
-        if (status == "Open") return <span style={{color: "black"}} > Open </span>
+        if (status == "Open" && pnl == null) return <span style={{color: "black"}} > Open </span>
+        if (status == "Open") return <span style={{color: pnl > 0 ? "green" : pnl < 0 ? "red" : "black"}} > Open ({pnl > 0 ? "+" : ""}{pnl.toFixed(2)} realized)</span>
         if (pnl > 0) return <span style={{color: "green"}} > +{pnl.toFixed(2)}</span>
         if (pnl < 0) return <span style={{color: "red"}} > {pnl.toFixed(2)}</span>
         return <span style={{color: "black" }}>0.00</span>
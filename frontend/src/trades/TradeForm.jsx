@@ -14,7 +14,7 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
   const [csvFile, setCsvFile] = useState(null)
   const [importingCsv, setImportingCsv] = useState(false)
 
-  const [broker, setBroker] = useState("tradezero")
+  const [broker, setBroker] = useState("")
   const [brokerCsvFile, setBrokerCsvFile] = useState(null)
   const [importingBrokerCsv, setImportingBrokerCsv] = useState(false)
 
@@ -66,6 +66,27 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
     setList(updated)
   }
 
+  const describeJob = (job) => {
+    const via = job.parser === "ai" ? "AI" : job.parser || "detecting format"
+    const { done, total } = job.progress || {}
+    // Broker exports are imported as they're parsed, with no total
+    const progress = total ? ` ${done}/${total}` : done ? ` ${done} trades` : ""
+    return `Importing (${via}): ${job.stage || "queued"}${progress}...`
+  }
+
+  // Imports run as background jobs, poll until this one finishes
+  const waitForImportJob = async (job) => {
+    while (job.status === "queued" || job.status === "running") {
+      setMessage(describeJob(job))
+      await new Promise((resolve) => setTimeout(resolve, 1000))
+      job = await makeRequest(`import-jobs/${job.job_id}`)
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Import failed")
+    }
+    return job
+  }
+
   const handleImportCsv = async () => {
     if (!csvFile) return
 
@@ -76,18 +97,15 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
       const formData = new FormData()
       formData.append("file", csvFile)
 
-      const result = await makeRequest("trades/import-csv", {
+      const job = await makeRequest("trades/import-csv", {
         method: "POST",
         body: formData,
       })
+      const result = await waitForImportJob(job)
 
-      const count =
-        result?.count ??
-        (Array.isArray(result?.created_trade_ids)
-          ? result.created_trade_ids.length
-          : 0)
-
-      setMessage(`Imported ${count} trade(s) from CSV via AI.`)
+      setMessage(
+        `Imported ${result.count} trade(s) from CSV (${result.parser === "ai" ? "via AI" : result.parser}).`
+      )
     } catch (err) {
       console.error(err)
       setMessage("CSV import (AI) failed: " + err.message)
@@ -97,7 +115,7 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
   }
 
   const handleImportBrokerCsv = async () => {
-    if (!brokerCsvFile || !broker) return
+    if (!brokerCsvFile) return
 
     setImportingBrokerCsv(true)
     setMessage(null)
@@ -106,21 +124,20 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
       const formData = new FormData()
       formData.append("file", brokerCsvFile)
 
-      const result = await makeRequest(
-        `trades/import-broker-csv?broker=${encodeURIComponent(broker)}`,
+      const query = broker ? `?broker=${encodeURIComponent(broker)}` : ""
+      const job = await makeRequest(
+        `trades/import-broker-csv${query}`,
         {
           method: "POST",
           body: formData,
         }
       )
+      const result = await waitForImportJob(job)
 
-      const count =
-        result?.count ??
-        (Array.isArray(result?.created_trade_ids)
-          ? result.created_trade_ids.length
-          : 0)
-
-      setMessage(`Imported ${count} trade(s) from ${broker}.`)
+      setMessage(
+        `Imported ${result.count} trade(s) (${result.parser === "ai" ? "parsed by AI" : result.parser}): ` +
+          `${result.created} new, ${result.merged} merged, ${result.skipped} already in your journal.`
+      )
     } catch (err) {
       console.error(err)
       setMessage("Broker CSV import failed: " + err.message)
@@ -174,7 +191,7 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
           Import Trades from CSV (AI)
         </h2>
         <p className="text-sm text-white/70 mb-3">
-          Upload any CSV export. The AI will read it and create trades directly in your journal.
+          Upload any CSV export. Known broker formats are read directly, anything else is read by AI.
         </p>
 
         <div className="flex flex-col sm:flex-row sm:items-center gap-3">
@@ -201,7 +218,7 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
           Import Trades from Broker CSV
         </h2>
         <p className="text-sm text-white/70 mb-3">
-          Select your broker and upload a CSV. The server will parse it based on the broker format.
+          Upload a CSV from your broker. The format is detected automatically, or pick it below.
         </p>
 
         <div className="flex flex-col sm:flex-row sm:items-center gap-3 mb-3">
@@ -210,7 +227,12 @@ export function TradeForm({ initialData = null, onSubmit = null }) {
             onChange={(e) => setBroker(e.target.value)}
             className="input max-w-xs"
           >
+            <option value="">Auto-detect</option>
             <option value="tradezero">TradeZero</option>
+            <option value="ibkr">Interactive Brokers (Flex Query)</option>
+            <option value="webull">Webull</option>
+            <option value="schwab">Charles Schwab</option>
+            <option value="robinhood">Robinhood</option>
           </select>
 
           <input
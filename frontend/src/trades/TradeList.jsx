@@ -7,24 +7,35 @@ export function TradeList() {
     const { makeRequest } = useApi()
     const { getToken } = useAuth()
     const [trades, setTrades] = useState([])
+    const [nextCursor, setNextCursor] = useState(null)
+    const [filters, setFilters] = useState({ ticker: "", status: "" })
     const [loading, setLoading] = useState(true)
+    const [loadingMore, setLoadingMore] = useState(false)
     const [error, setError] = useState(null)
     const navigate = useNavigate()
 
     useEffect(() => {
         fetchTrades()
-    }, [])
+    }, [filters])
 
-    const fetchTrades = async () => {
+    // Pages come from the server in listing order, pass the cursor to append the next one
+    const fetchTrades = async (cursor = null) => {
+        const params = new URLSearchParams()
+        if (filters.ticker) params.set("ticker", filters.ticker)
+        if (filters.status) params.set("status", filters.status)
+        if (cursor) params.set("cursor", cursor)
+
+        if (cursor) setLoadingMore(true)
         try {
-            const data = await makeRequest("trades")
-            console.log("Fetched trades:", data)
-            setTrades(data.trades)
+            const data = await makeRequest(`trades?${params.toString()}`)
+            setTrades((prev) => (cursor ? [...prev, ...data.trades] : data.trades))
+            setNextCursor(data.next_cursor)
         } catch(err) {
             console.error("Fetch error:", err)
             setError("Failed to load trades.")
         } finally {
             setLoading(false)
+            setLoadingMore(false)
         }
     }
 
@@ -47,7 +58,8 @@ export function TradeList() {
 
 
     const formatPnl = (pnl, status) => {
-        if (status == "Open") return <span style={{color: "black"}} > Open </span>
+        if (status == "Open" && pnl == null) return <span style={{color: "black"}} > Open </span>
+        if (status == "Open") return <span style={{color: pnl > 0 ? "green" : pnl < 0 ? "red" : "black"}} > Open ({pnl > 0 ? "+" : ""}{pnl.toFixed(2)} realized)</span>
         if (pnl > 0) return <span style={{color: "green"}} > +{pnl.toFixed(2)}</span>
         if (pnl < 0) return <span style={{color: "red"}} > {pnl.toFixed(2)}</span>
         return <span style={{color: "black" }}>0.00</span>
@@ -104,6 +116,29 @@ export function TradeList() {
           </button>
         )}
       </div>
+      <div className="flex gap-3 mb-4">
+        <input
+          type="text"
+          placeholder="Ticker"
+          defaultValue={filters.ticker}
+          onKeyDown={(e) => {
+            if (e.key === "Enter") setFilters({ ...filters, ticker: e.target.value.trim() })
+          }}
+          onBlur={(e) => {
+            if (e.target.value.trim() !== filters.ticker) setFilters({ ...filters, ticker: e.target.value.trim() })
+          }}
+          className="bg-white/10 text-white px-3 py-1 rounded-md text-sm"
+        />
+        <select
+          value={filters.status}
+          onChange={(e) => setFilters({ ...filters, status: e.target.value })}
+          className="bg-white/10 text-white px-3 py-1 rounded-md text-sm"
+        >
+          <option value="">All</option>
+          <option value="Open">Open</option>
+          <option value="Closed">Closed</option>
+        </select>
+      </div>
       {trades.length === 0 ? (
         <p className="text-white/80">No trades yet.</p>
       ) : (
@@ -187,6 +222,17 @@ export function TradeList() {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <div className="flex justify-center mt-4">
+              <button
+                onClick={() => fetchTrades(nextCursor)}
+                disabled={loadingMore}
+                className="bg-pink-600 hover:bg-pink-500 text-white px-4 py-2 rounded-md text-sm shadow cursor-pointer disabled:opacity-50"
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>